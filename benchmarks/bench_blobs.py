@@ -0,0 +1,91 @@
+"""
+Benchmark the content-addressed discourse store.
+
+Usage::
+
+    $ python benchmarks/bench_blobs.py [n_discourses] [codec]
+
+Compares the disk footprint and read throughput of keeping full discourse
+texts in both the full-speech and speeches_by_date caches against keeping
+them once in a compressed BlobStore referenced by hashes.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from faker import Factory
+
+from tenhodito_nlp.cache import BlobStore, SQLiteCache
+
+
+def discourses(n, seed=0):
+    fake = Factory.create(locale='pt-br')
+    fake.seed_instance(seed)
+    return ['\n\n'.join(fake.paragraphs(nb=20)) for _ in range(n)]
+
+
+def disk_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, f))
+               for f in os.listdir(directory))
+
+
+def fill(tmp, texts, store=None):
+    """
+    Fill a full-speech and a speeches_by_date cache like DiscourseMiner
+    does, either with full texts or with references to the store.
+    """
+
+    full = SQLiteCache(os.path.join(tmp, 'full-speech.sqlite'))
+    dates = SQLiteCache(os.path.join(tmp, 'speeches_by_date.sqlite'),
+                        index_dates=True)
+    data = []
+    for i, text in enumerate(texts):
+        value = text if store is None else store.put(text)
+        full['%d::1::1::1' % i] = {'discurso': value}
+        data.append(('Deputado', value))
+        if len(data) == 10:
+            dates['%d/1/2016' % (1 + i // 10 % 28)] = data
+            data = []
+    for cache in [full, dates] + ([store] if store else []):
+        cache.close()
+    return full, dates
+
+
+def read_throughput(tmp, store=None):
+    full = SQLiteCache(os.path.join(tmp, 'full-speech.sqlite'))
+    start = time.perf_counter()
+    size = 0
+    for _, value in full.items():
+        text = value['discurso']
+        if store is not None:
+            text = store[text]
+        size += len(text.encode('utf-8'))
+    return size / 2 ** 20 / (time.perf_counter() - start)
+
+
+def main(n=5000, codec='zlib'):
+    texts = discourses(n)
+    raw = sum(len(t.encode('utf-8')) for t in texts) / 2 ** 20
+    print('%d discourses, %.1f MB of text' % (n, raw))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fill(tmp, texts)
+        size = disk_size(tmp)
+        speed = read_throughput(tmp)
+        print('    full texts: %8.1f MB on disk %8.1f MB/s'
+              % (size / 2 ** 20, speed))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'discourses.sqlite')
+        fill(tmp, texts, BlobStore(path, codec=codec))
+        size = disk_size(tmp)
+        speed = read_throughput(tmp, BlobStore(path, codec=codec))
+        print('    blob store: %8.1f MB on disk %8.1f MB/s (%s)'
+              % (size / 2 ** 20, speed, codec))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(*([int(arg) for arg in args[:1]] + args[1:]))
@@ -0,0 +1,87 @@
+"""
+Benchmark the SQLite cache backend against shelve.
+
+Usage::
+
+    $ python benchmarks/bench_cache.py [n_items]
+
+The shelve benchmark reproduces the old behavior of synchronizing the file
+after every insertion.
+"""
+
+import os
+import random
+import shelve
+import sys
+import tempfile
+import time
+
+from tenhodito_nlp.cache import open_cache
+
+
+def items(n):
+    """
+    Return n fake (date, speeches) pairs.
+    """
+
+    text = 'Sr. Presidente, Srs. Deputados, ' * 200
+    return [('%d/%d/%d' % (1 + i % 28, 1 + i // 28 % 12, 2000 + i // 336),
+             [('Deputado %d' % j, text) for j in range(5)])
+            for i in range(n)]
+
+
+def bench_shelve(path, data, keys):
+    start = time.perf_counter()
+    db = shelve.open(path)
+    for key, value in data:
+        db[key] = value
+        db.sync()
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        db[key]
+    read = time.perf_counter() - start
+    db.close()
+    return write, read
+
+
+def bench_cache(path, data, keys, backend):
+    start = time.perf_counter()
+    db = open_cache(path, backend)
+    for key, value in data:
+        db[key] = value
+    db.sync()
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        db[key]
+    read = time.perf_counter() - start
+    db.close()
+    return write, read
+
+
+def main(n=2000):
+    data = items(n)
+    keys = [key for (key, _) in data]
+    random.Random(0).shuffle(keys)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            ('shelve (sync)', bench_shelve(os.path.join(tmp, 'a.db'), data,
+                                           keys)),
+            ('shelve (batch)', bench_cache(os.path.join(tmp, 'b'), data, keys,
+                                           'shelve')),
+            ('sqlite (batch)', bench_cache(os.path.join(tmp, 'c'), data, keys,
+                                           'sqlite')),
+        ]
+
+    print('%d items' % n)
+    for name, (write, read) in results:
+        print('    %-16s %10.0f writes/s %8.1f us/lookup'
+              % (name, n / write, 1e6 * read / n))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,230 @@
+"""
+Benchmark suite for the NLP core.
+
+Times each stage over deterministic synthetic corpora of increasing size,
+records the peak memory allocated by each stage and compares the results
+with a stored baseline. Stages that are slower or use more memory than the
+baseline (beyond the given tolerances) are reported and the script exits
+with status 1.
+
+Baseline times are scaled by the ratio between the times of a fixed
+calibration workload on the current machine and on the machine that saved
+the baseline. Save a new baseline with --save after changes that are
+expected to change performance.
+
+Usage::
+
+    $ python benchmarks/bench_nlp.py [--sizes 250 1000 2000] [--save]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import scipy.cluster.vq  # loaded by nlp.kmeans() on first use, not timed
+from bench_stemize import corpus
+from tenhodito_nlp import nlp, stemming
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SIZES = [250, 1000, 2000]
+PARAGRAPHS = 5
+METHODS = ['boolean', 'frequency', 'count', 'weighted']
+K = 8
+
+
+def calibrate(repeat=5):
+    """
+    Return the best time of a fixed pure Python workload.
+    """
+
+    words = ['palavra%d' % (i % 997) for i in range(200000)]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Counter(word.upper() for word in words)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def stages(texts):
+    """
+    Return a list of (name, func) pairs with the benchmarked stages.
+
+    Each function runs a stage from scratch. Stages that depend on a job use
+    one that was created beforehand.
+    """
+
+    job = nlp.NLPJob(texts)
+    weights = job.weights()
+    stems = [stemming.stemize(text) for text in texts]
+
+    def stemize():
+        stemming.clear_stem_cache()
+        for text in texts:
+            stemming.stemize(text)
+
+    def bag_of_words(method):
+        def func():
+            for data in stems:
+                stemming.bag_of_words(data, method, weights)
+        return func
+
+    def nlp_job():
+        stemming.clear_stem_cache()
+        nlp.NLPJob(texts)
+
+    def compute_weights():
+        job._weights.clear()
+        job._update_weights()
+        job.weights()
+
+    def matrix():
+        job._matrices.clear()
+        job.matrix()
+
+    def similarity_matrix():
+        job.similarity_matrix()
+
+    def kmeans():
+        nlp.kmeans(job, K, seed=0)
+
+    result = [('stemize', stemize)]
+    result.extend(('bag_of_words[%s]' % method, bag_of_words(method))
+                  for method in METHODS)
+    result.extend([
+        ('NLPJob', nlp_job),
+        ('weights', compute_weights),
+        ('matrix', matrix),
+        ('similarity_matrix', similarity_matrix),
+        ('kmeans', kmeans),
+    ])
+    return result
+
+
+def measure(func, repeat=5):
+    """
+    Return the best wall time of several runs and the peak memory of an
+    additional run traced by tracemalloc.
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'time': min(times), 'memory': peak}
+
+
+def run(sizes, repeat=5):
+    """
+    Return a {size: {stage: {'time': seconds, 'memory': bytes}}} dictionary.
+    Sizes are strings, as in the JSON baseline. The 'calibration' key has the
+    time returned by :func:`calibrate`.
+    """
+
+    results = {'calibration': calibrate()}
+    for size in sizes:
+        texts = corpus(size, PARAGRAPHS)
+        results[str(size)] = row = {}
+        for name, func in stages(texts):
+            row[name] = measure(func, repeat)
+            print('%6d texts  %-24s %9.4f s  %9.1f KiB'
+                  % (size, name, row[name]['time'],
+                     row[name]['memory'] / 1024))
+    return results
+
+
+def compare(results, baseline, tolerance=0.5, memory_tolerance=0.1,
+            min_time=0.02, min_memory=64 * 1024):
+    """
+    Return a list of messages for the stages that regressed with respect to
+    the baseline.
+
+    Differences below min_time seconds or min_memory bytes are ignored, since
+    they are dominated by noise.
+    """
+
+    speed = results['calibration'] / baseline.get('calibration',
+                                                   results['calibration'])
+    sizes = [size for size in results if size != 'calibration']
+    regressions = []
+    for size in sorted(sizes, key=int):
+        for name, value in results[size].items():
+            try:
+                base = baseline[size][name]
+            except KeyError:
+                continue
+            base_time = base['time'] * speed
+            limit = max(base_time * (1 + tolerance), base_time + min_time)
+            if value['time'] > limit:
+                regressions.append(
+                    '%s texts, %s: %.4f s (baseline %.4f s, %+.0f%%)'
+                    % (size, name, value['time'], base_time,
+                       100 * (value['time'] / base_time - 1)))
+            limit = max(base['memory'] * (1 + memory_tolerance),
+                        base['memory'] + min_memory)
+            if value['memory'] > limit:
+                regressions.append(
+                    '%s texts, %s: %d bytes (baseline %d bytes, %+.0f%%)'
+                    % (size, name, value['memory'], base['memory'],
+                       100 * (value['memory'] / base['memory'] - 1)))
+    return regressions
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='number of texts in each corpus')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed runs of each stage')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline file (default: %(default)s)')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative increase in time')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+                        help='allowed relative increase in peak memory')
+    return parser
+
+
+def main(args=None):
+    args = get_parser().parse_args(args)
+    results = run(args.sizes, args.repeat)
+
+    if args.save:
+        with open(args.baseline, 'w') as fd:
+            json.dump(results, fd, indent=2, sort_keys=True)
+        print('baseline saved to %s' % args.baseline)
+        return
+
+    if not os.path.exists(args.baseline):
+        print('no baseline in %s; run with --save to create one'
+              % args.baseline)
+        return
+    with open(args.baseline) as fd:
+        baseline = json.load(fd)
+
+    regressions = compare(results, baseline, args.tolerance,
+                          args.memory_tolerance)
+    if regressions:
+        print('\nPERFORMANCE REGRESSIONS:')
+        for message in regressions:
+            print('  ' + message)
+        sys.exit(1)
+    print('\nno regressions')
+
+
+if __name__ == '__main__':
+    main()
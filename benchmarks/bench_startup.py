@@ -0,0 +1,76 @@
+"""
+Benchmark the startup time of the package.
+
+Runs ``import tenhodito_nlp`` followed by a stemize() call in fresh
+interpreters and compares the best time, minus the startup time of a bare
+interpreter, with a budget. The script exits with status 1 if the budget is
+exceeded or if the import loaded a module that should only be loaded on
+demand.
+
+Usage::
+
+    $ python benchmarks/bench_startup.py [--repeat 10] [--budget 0.1]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Seconds spent importing the package and stemming a sentence, not counting
+# the interpreter startup
+BUDGET = 0.1
+
+# Modules that must not be loaded by a stemize() call
+HEAVY_MODULES = ['numpy', 'scipy', 'faker', 'pygov_br', 'requests',
+                 'sklearn', 'tenhodito_nlp.nlp', 'tenhodito_nlp.miner']
+
+STARTUP = '''
+import sys, json
+import tenhodito_nlp
+tenhodito_nlp.stemize('O deputado defendeu a reforma da previdência.')
+print(json.dumps(sorted(sys.modules)))
+'''
+
+
+def run(code):
+    """
+    Run code in a new interpreter and return (elapsed, stdout).
+    """
+
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return time.perf_counter() - start, output
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=BUDGET)
+    args = parser.parse_args(args)
+
+    bare = min(run('pass')[0] for _ in range(args.repeat))
+    times = []
+    for _ in range(args.repeat):
+        elapsed, output = run(STARTUP)
+        times.append(elapsed)
+    startup = min(times) - bare
+    modules = json.loads(output.decode('utf-8'))
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+
+    print('bare interpreter:  %.4f s' % bare)
+    print('import + stemize:  %.4f s (budget %.4f s)' % (startup, args.budget))
+    failed = False
+    if startup > args.budget:
+        print('\nstartup exceeds the budget')
+        failed = True
+    if loaded:
+        print('\nmodules loaded at startup: %s' % ', '.join(loaded))
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
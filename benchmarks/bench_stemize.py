@@ -0,0 +1,119 @@
+"""
+Benchmark stemize() with and without the stem cache.
+
+Usage::
+
+    $ python benchmarks/bench_stemize.py [n_texts] [paragraphs]
+"""
+
+import functools
+import itertools
+import random
+import sys
+import time
+
+from tenhodito_nlp import stemming
+from tenhodito_nlp.stemming import strip_punctuation
+
+# Number of distinct words in the benchmark corpus and fraction of tokens that
+# are stop words. Word frequencies follow Zipf's law, so the number of
+# distinct stems grows with the size of the corpus as in real speeches.
+VOCABULARY_SIZE = 50000
+STOP_WORD_RATE = 0.4
+
+ONSETS = ['', 'b', 'c', 'd', 'f', 'g', 'j', 'l', 'm', 'n', 'p', 'r', 's',
+          't', 'v', 'br', 'ch', 'cr', 'fl', 'gr', 'lh', 'nh', 'pr', 'qu',
+          'tr']
+VOWELS = ['a', 'e', 'i', 'o', 'u']
+SUFFIXES = ['', 's', 'r', 'ção', 'ções', 'mente', 'dade', 'dades', 'do',
+            'da', 'dos', 'das', 'ndo', 'mos', 'ram', 'vel', 'veis', 'nte',
+            'ntes', 'ista', 'ismo', 'eiro', 'eira', 'ável', 'ência', 'ário',
+            'ão', 'ões', 'ês']
+
+
+def uncached_stemize(text, stop_words=None):
+    """
+    Reference implementation of stemize() that does not use the stem cache.
+    """
+
+    if stop_words is None:
+        stop_words = stemming.default_stop_words()
+    stemmer = stemming.stemmer
+    stop_stems = set(stemmer.stemWords(stop_words))
+    words = text.casefold().split()
+    words = stemmer.stemWords([strip_punctuation(word) for word in words])
+    return [w for w in words if w and w not in stop_stems]
+
+
+@functools.lru_cache(maxsize=None)
+def vocabulary(size=VOCABULARY_SIZE, seed=0):
+    """
+    Return a deterministic list of distinct Portuguese-like words, from the
+    most to the least frequent.
+    """
+
+    rng = random.Random(seed)
+    syllables = [onset + vowel for onset in ONSETS for vowel in VOWELS]
+    words = {}
+    while len(words) < size:
+        n_syllables = rng.randint(1, 4)
+        word = ''.join(rng.choices(syllables, k=n_syllables))
+        words[word + rng.choice(SUFFIXES)] = None
+    return list(words)
+
+
+def corpus(n_texts, paragraphs, seed=0, size=VOCABULARY_SIZE):
+    """
+    Return a deterministic list of synthetic texts.
+
+    Words are drawn from :func:`vocabulary` with Zipf-distributed
+    frequencies and mixed with the default stop words. Each paragraph has
+    three sentences of 5 to 15 words.
+    """
+
+    rng = random.Random(seed)
+    words = vocabulary(size, seed)
+    weights = list(itertools.accumulate(1 / rank
+                                        for rank in range(1, size + 1)))
+    stop_words = stemming.default_stop_words()
+
+    def sentence():
+        n_words = rng.randint(5, 15)
+        tokens = [rng.choice(stop_words) if rng.random() < STOP_WORD_RATE
+                  else word
+                  for word in rng.choices(words, cum_weights=weights,
+                                          k=n_words)]
+        return ' '.join(tokens).capitalize() + '.'
+
+    def paragraph():
+        return ' '.join(sentence() for _ in range(3))
+
+    return ['\n\n'.join(paragraph() for _ in range(paragraphs))
+            for _ in range(n_texts)]
+
+
+def tokens_per_second(func, texts):
+    n_tokens = sum(len(text.split()) for text in texts)
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return n_tokens / (time.perf_counter() - start)
+
+
+def main(n_texts=2000, paragraphs=5):
+    texts = corpus(n_texts, paragraphs)
+    stemming.clear_stem_cache()
+    before = tokens_per_second(uncached_stemize, texts)
+    after = tokens_per_second(stemming.stemize, texts)
+    info = stemming.stem_cache_info()
+
+    n_tokens = sum(len(text.split()) for text in texts)
+    print('texts: %s, tokens: %s' % (n_texts, n_tokens))
+    print('uncached: %12.0f tokens/s' % before)
+    print('cached:   %12.0f tokens/s (%.1fx)' % (after, after / before))
+    print('cache:    %s hits, %s misses, %s stems'
+          % (info.hits, info.misses, info.currsize))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
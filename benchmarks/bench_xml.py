@@ -0,0 +1,80 @@
+"""
+Benchmark the incremental XML parser of the crawler against untangle.
+
+Usage::
+
+    $ python benchmarks/bench_xml.py [speeches.xml ...]
+
+Files must be saved responses from the ListarDiscursosPlenario endpoint. If
+no file is given, the sessions of the sample response used by the tests are
+repeated to build a large response.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import untangle
+
+from tenhodito_nlp import crawler
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'src',
+                      'tenhodito_nlp', 'tests', 'data',
+                      'ListarDiscursosPlenario.xml')
+
+
+def sample_speeches(n_copies=2000, path=SAMPLE):
+    """
+    Return a saved ListarDiscursosPlenario response as bytes, with its
+    sessions repeated n_copies times.
+    """
+
+    with open(path, 'rb') as fd:
+        content = fd.read()
+    start = content.index(b'<sessao>')
+    end = content.rindex(b'</sessao>') + len(b'</sessao>')
+    return content[:start] + content[start:end] * n_copies + content[end:]
+
+
+def parse_untangle(content):
+    obj = untangle.parse(content.decode('utf-8'))
+    result = []
+    for session in obj.sessoesDiscursos.sessao:
+        for phase in session.fasesSessao.faseSessao:
+            for speech in phase.discursos.discurso:
+                result.append(speech.txtIndexacao.cdata)
+    return len(result)
+
+
+def parse_iter_records(content):
+    records = crawler.iter_records(content, 'discurso', ['txtIndexacao'])
+    return sum(1 for _ in records)
+
+
+def measure(func, content):
+    tracemalloc.start()
+    start = time.perf_counter()
+    n = func(content)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n, elapsed, peak
+
+
+def main(paths):
+    if paths:
+        samples = [(path, open(path, 'rb').read()) for path in paths]
+    else:
+        samples = [('sample x 2000', sample_speeches())]
+
+    for name, content in samples:
+        print('%s: %.1f MB' % (name, len(content) / 2 ** 20))
+        for func in [parse_untangle, parse_iter_records]:
+            n, elapsed, peak = measure(func, content)
+            print('    %-20s %6d speeches %8.3f s %8.1f MB peak'
+                  % (func.__name__, n, elapsed, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
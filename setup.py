@@ -48,6 +48,7 @@ setup(
     # Packages and dependencies
     package_dir={'': 'src'},
     packages=find_packages('src'),
+    package_data={'tenhodito_nlp.tests': ['data/*.xml']},
     install_requires=[
     ],
     extras_require={
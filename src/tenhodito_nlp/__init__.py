@@ -1 +1,35 @@
-from .__meta__ import __author__, __version__
\ No newline at end of file
+from .__meta__ import __author__, __version__
+
+# Public names and the modules that define them. Modules are imported on first
+# access, so importing the package does not load numpy, scipy, PyStemmer or the
+# Câmara API client.
+_lazy = {
+    'stemize': 'stemming',
+    'iter_stems': 'stemming',
+    'bag_of_words': 'stemming',
+    'Text': 'nlp',
+    'NLPJob': 'nlp',
+    'kmeans': 'nlp',
+    'kmeans_sweep': 'nlp',
+    'Corpus': 'corpus',
+    'DeputyTexts': 'miner',
+    'DiscourseMiner': 'miner',
+    'fake_text': 'fakes',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _lazy[name]
+    except KeyError:
+        raise AttributeError('module %r has no attribute %r'
+                             % (__name__, name)) from None
+    from importlib import import_module
+
+    value = getattr(import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -1,6 +1,8 @@
 import argparse
+import math
+import sys
 import tenhodito_nlp
-from tenhodito_nlp import __version__
+from tenhodito_nlp import __version__, profiling, streams
 
 
 def get_parser():
@@ -10,8 +12,150 @@ def get_parser():
     parser = argparse.ArgumentParser('tenhodito-nlp')
     version = '%(prog)s ' + __version__
     parser.add_argument('--version', '-v', action='version', version=version)
+    parser.add_argument('--profile', action='store_true',
+                        help='print time, calls, cache hit rates and peak '
+                             'memory of each stage to stderr')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+
+    # fetch: congressmen, proposals and speeches from the Câmara API
+    fetch = subparsers.add_parser(
+        'fetch', help='crawl congressmen, proposals and speeches')
+    from tenhodito_nlp.crawler import add_arguments
+    add_arguments(fetch)
+    fetch.set_defaults(func=fetch_command)
+
+    # mine: full discourses of each deputy
+    mine = subparsers.add_parser(
+        'mine', help='extract the discourses of each deputy in an interval')
+    mine.add_argument('start', help='start date (DD/MM/YYYY)')
+    mine.add_argument('end', nargs='?', default=None,
+                      help='end date (DD/MM/YYYY). Defaults to today')
+    mine.add_argument('--output', '-o', default='-',
+                      help='JSON Lines output file, one deputy per line. '
+                           'Defaults to stdout')
+    mine.add_argument('--cache-dir', default='.',
+                      help='directory of the discourse store and API caches')
+    mine.add_argument('--cache-backend', choices=['sqlite', 'shelve'],
+                      help='backend of the speeches cache')
+    mine.add_argument('--jobs', '-j', type=int, default=1,
+                      help='number of concurrent requests')
+    mine.add_argument('--dedup', nargs='?', type=float, const=True,
+                      metavar='THRESHOLD',
+                      help='ignore near duplicate discourses of a deputy')
+    mine.add_argument('--metrics', metavar='FILE',
+                      help='write request metrics to FILE in the Prometheus '
+                           'text format during the crawl')
+    mine.add_argument('--metrics-interval', type=float, default=15,
+                      help='seconds between writes of the metrics file')
+    mine.set_defaults(func=mine_command)
+
+    # process: coherence between proposals and speeches
+    process = subparsers.add_parser(
+        'process', aliases=['coherence'],
+        help='compute the coherence between proposals and speeches')
+    process.add_argument('input', nargs='?', default='data.json',
+                         help='output of the fetch command')
+    process.add_argument('output', nargs='?', default='final.json',
+                         help='output file. Use .jsonl files (or - for '
+                              'stdin/stdout) to stream congressmen')
+    process.set_defaults(func=process_command)
+
+    # cluster: k-means over the texts of a JSON Lines file
+    cluster = subparsers.add_parser(
+        'cluster', help='group the texts of a JSON Lines file with k-means')
+    cluster.add_argument('input', nargs='?', default='-',
+                         help='JSON Lines input file (e.g., the output of '
+                              'mine). Defaults to stdin')
+    cluster.add_argument('--output', '-o', default='-',
+                         help='JSON Lines output file. Defaults to stdout')
+    cluster.add_argument('-k', type=int, nargs='+', default=[5],
+                         help='numbers of clusters. If several are given, '
+                              'the one with the largest silhouette is used')
+    cluster.add_argument('--n-init', type=int, default=10,
+                         help='number of random restarts for each k')
+    cluster.add_argument('--batch-size', type=int,
+                         help='use mini-batch k-means on the sparse matrix')
+    cluster.add_argument('--seed', type=int, default=0,
+                         help='seed of the first restart')
+    cluster.add_argument('--jobs', '-j', type=int, default=None,
+                         help='number of worker processes. Defaults to all '
+                              'cores')
+    cluster.add_argument('--no-whiten', dest='whiten', action='store_false',
+                         help='do not scale columns by their standard '
+                              'deviation')
+    cluster.add_argument('--name-field', default='deputy',
+                         help='field that identifies each record')
+    cluster.add_argument('--text-field', default='discourses',
+                         help='field with the text (or list of texts) of '
+                              'each record')
+    cluster.set_defaults(func=cluster_command)
     return parser
 
+
+def fetch_command(args):
+    from tenhodito_nlp import crawler
+
+    crawler.run(args)
+
+
+def mine_command(args):
+    from tenhodito_nlp import miner
+    from tenhodito_nlp.metrics import Metrics
+
+    miner.set_cache_dir(args.cache_dir)
+    metrics = Metrics(args.metrics, args.metrics_interval)
+    discourses = miner.DiscourseMiner(max_workers=args.jobs,
+                                      cache_backend=args.cache_backend,
+                                      dedup=args.dedup, metrics=metrics)
+    with metrics:
+        discourses.read_interval(args.start, args.end)
+    records = ({'deputy': deputy.name,
+                'discourses': list(deputy.discourses)}
+               for deputy in discourses.deputies())
+    streams.write_jsonl(records, args.output)
+    print(metrics.summary(), file=sys.stderr)
+
+
+def process_command(args):
+    from tenhodito_nlp import coherence
+
+    coherence.main(args.input, args.output)
+
+
+def cluster_command(args):
+    from tenhodito_nlp.nlp import NLPJob, kmeans_sweep
+
+    names, texts = [], []
+    for record in streams.read_jsonl(args.input):
+        text = record[args.text_field]
+        if isinstance(text, list):
+            text = '\n\n'.join(text)
+        names.append(record[args.name_field])
+        texts.append(text)
+
+    job = NLPJob(texts, n_jobs=args.jobs)
+    results = kmeans_sweep(job, args.k, n_init=args.n_init, whiten=args.whiten,
+                           batch_size=args.batch_size, seed=args.seed,
+                           n_jobs=args.jobs, silhouette=len(args.k) > 1)
+    for k, result in sorted(results.items()):
+        silhouette = result.silhouette
+        silhouette = '-' if math.isnan(silhouette) else '%.4f' % silhouette
+        print('k=%d inertia=%.4f silhouette=%s'
+              % (k, result.inertia, silhouette), file=sys.stderr)
+
+    # The silhouette is NaN if it is undefined (e.g., k=1) or not computed
+    def score(result):
+        if math.isnan(result.silhouette):
+            return -math.inf
+        return result.silhouette
+
+    best = max(results.values(), key=lambda r: (score(r), -r.k))
+
+    records = ({args.name_field: name, 'cluster': int(label), 'k': best.k}
+               for (name, label) in zip(names, best.labels))
+    streams.write_jsonl(records, args.output)
+
+
 def main(args=None):
     """
     Main entry point for your project.
@@ -24,10 +168,18 @@ def main(args=None):
 
     parser = get_parser()
     args = parser.parse_args(args)
+    if args.command is None:
+        parser.print_help()
+        return
 
-    # Put your main script logic here
-    print('No action defined for tenhodito_nlp module!')
+    if args.profile:
+        profiling.enable()
+    try:
+        args.func(args)
+    finally:
+        if args.profile:
+            print(profiling.disable(), file=sys.stderr)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,456 @@
+import datetime
+import dbm
+import hashlib
+import os
+import pickle
+import shelve
+import sqlite3
+import threading
+import zlib
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CACHE_BACKEND = 'sqlite'
+BATCH_SIZE = 100
+COMPRESSION_LEVEL = 6
+
+
+def date_key(key):
+    """
+    Return an ISO formatted date from a D/M/YYYY key or None if key is not a
+    date.
+    """
+
+    try:
+        dd, mm, yyyy = map(int, key.split('/'))
+        return datetime.date(yyyy, mm, dd).isoformat()
+    except ValueError:
+        return None
+
+
+def _iso(date):
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return date.isoformat()[:10]
+    return date_key(date)
+
+
+class SQLiteCache:
+    """
+    A persistent dictionary stored in a SQLite database.
+
+    The database uses WAL mode, so several processes can read from it while
+    another one writes. Writes are buffered and committed in a single
+    transaction every ``batch_size`` insertions, when :meth:`sync` is called
+    or at the end of a :meth:`batch` block.
+
+    Args:
+        path (str):
+            Database file.
+        batch_size (int):
+            Number of writes in each transaction.
+        index_dates (bool):
+            If True, keys are D/M/YYYY dates indexed for :meth:`range`
+            queries.
+        depends (list):
+            Stores that are synchronized before each commit (e.g., the
+            :class:`BlobStore` with texts referenced by the cached values).
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, index_dates=False,
+                 depends=()):
+        self.path = path
+        self.batch_size = batch_size
+        self.index_dates = index_dates
+        self.depends = list(depends)
+        self._pending = {}
+        self._batch_depth = 0
+        self._lock = threading.RLock()
+        self._connect()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                     '(key TEXT PRIMARY KEY, date TEXT, value BLOB)')
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_date ON cache(date)')
+        conn.commit()
+        self._conn = conn
+
+    def __getstate__(self):
+        self.sync()
+        return {'path': self.path, 'batch_size': self.batch_size,
+                'index_dates': self.index_dates, 'depends': self.depends}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.path)
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                return self._pending[key]
+            except KeyError:
+                pass
+            row = self._conn.execute('SELECT value FROM cache WHERE key=?',
+                                     (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self._loads(row[0])
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+            if not self._batch_depth and len(self._pending) >= self.batch_size:
+                self.sync()
+
+    def __contains__(self, key):
+        # Values are not loaded, since blobs are decompressed on load
+        with self._lock:
+            if key in self._pending:
+                return True
+            row = self._conn.execute('SELECT 1 FROM cache WHERE key=?',
+                                     (key,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        self.sync()
+        return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def __iter__(self):
+        self.sync()
+        for (key,) in self._conn.execute('SELECT key FROM cache'):
+            yield key
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        self.sync()
+        for key, value in self._conn.execute('SELECT key, value FROM cache'):
+            yield key, self._loads(value)
+
+    def update(self, items):
+        """
+        Insert all (key, value) pairs in a single transaction.
+        """
+
+        with self.batch():
+            for key, value in dict(items).items():
+                self[key] = value
+
+    def range(self, start, end):
+        """
+        Iterate over the (key, value) pairs with dates between start and end
+        (inclusive) in chronological order.
+
+        Only available for caches created with index_dates=True.
+        """
+
+        if not self.index_dates:
+            raise TypeError('keys are not indexed by date')
+        self.sync()
+        query = ('SELECT key, value FROM cache WHERE date BETWEEN ? AND ? '
+                 'ORDER BY date')
+        with self._lock:
+            rows = self._conn.execute(query, (_iso(start), _iso(end)))
+            rows = rows.fetchall()
+        for key, value in rows:
+            yield key, self._loads(value)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that commits all writes in the block in a single
+        transaction.
+        """
+
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.sync()
+
+    def sync(self):
+        """
+        Commit all pending writes.
+        """
+
+        with self._lock:
+            if not self._pending:
+                return
+            for store in self.depends:
+                store.sync()
+            date = date_key if self.index_dates else lambda key: None
+            rows = [(key, date(key), self._dumps(value))
+                    for (key, value) in self._pending.items()]
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO cache (key, date, value) '
+                    'VALUES (?, ?, ?)', rows)
+            self._pending.clear()
+
+    def close(self):
+        self.sync()
+        self._conn.close()
+
+    def _dumps(self, value):
+        return pickle.dumps(value, -1)
+
+    def _loads(self, data):
+        return pickle.loads(data)
+
+
+class BlobRef(str):
+    """
+    Hash of a text stored in a :class:`BlobStore`.
+    """
+
+    __slots__ = ()
+
+
+class BlobStore(SQLiteCache):
+    """
+    A content-addressed store of compressed texts.
+
+    Texts are stored once, keyed by the SHA-1 hash of their contents, and
+    compressed with zlib or zstd.
+
+    Args:
+        path (str):
+            Database file. The default is to keep the store in memory.
+        codec (str):
+            Either 'zlib' or 'zstd'. The later requires the zstandard module.
+        level (int):
+            Compression level.
+    """
+
+    def __init__(self, path=':memory:', batch_size=BATCH_SIZE, codec='zlib',
+                 level=COMPRESSION_LEVEL):
+        if codec == 'zstd' and zstandard is None:
+            raise ImportError('zstd codec requires the zstandard module')
+        if codec not in ('zlib', 'zstd'):
+            raise ValueError('invalid codec: %r' % codec)
+        self.codec = codec
+        self.level = level
+        super().__init__(path, batch_size)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.update(codec=self.codec, level=self.level)
+        del state['index_dates'], state['depends']
+        return state
+
+    def put(self, text):
+        """
+        Store text and return its :class:`BlobRef`.
+
+        References are returned unchanged.
+        """
+
+        if isinstance(text, BlobRef):
+            return text
+        ref = BlobRef(hashlib.sha1(text.encode('utf-8')).hexdigest())
+        if ref not in self:
+            self[ref] = text
+        return ref
+
+    def get(self, ref, default=None):
+        """
+        Return the text for the given reference.
+        """
+
+        return super().get(ref, default)
+
+    def size(self):
+        """
+        Return the total size of the compressed texts in bytes.
+        """
+
+        self.sync()
+        query = 'SELECT COALESCE(SUM(LENGTH(value)), 0) FROM cache'
+        return self._conn.execute(query).fetchone()[0]
+
+    # Compressed values start with one byte identifying the codec, so stores
+    # can be read regardless of the codec used to write them.
+    def _dumps(self, value):
+        data = value.encode('utf-8')
+        if self.codec == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            return b's' + compressor.compress(data)
+        return b'z' + zlib.compress(data, self.level)
+
+    def _loads(self, data):
+        codec, data = data[:1], data[1:]
+        if codec == b's':
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+
+class BlobList(Sequence):
+    """
+    A read-only sequence of texts referenced by hashes in a
+    :class:`BlobStore`.
+
+    Texts are decompressed only when accessed.
+    """
+
+    def __init__(self, store, refs):
+        self.store = store
+        self.refs = refs
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.refs)
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.store[ref] for ref in self.refs[idx]]
+        return self.store[self.refs[idx]]
+
+
+class ShelveCache:
+    """
+    Same interface as :class:`SQLiteCache`, but stored in a shelve file.
+
+    The shelve is synchronized every ``batch_size`` insertions. Range queries
+    must scan all keys.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, index_dates=False,
+                 depends=()):
+        self.path = path
+        self.batch_size = batch_size
+        self.index_dates = index_dates
+        self.depends = list(depends)
+        self._db = shelve.open(path)
+        self._unsynced = 0
+        self._batch_depth = 0
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.path)
+
+    def __getitem__(self, key):
+        return self._db[key]
+
+    def __setitem__(self, key, value):
+        self._db[key] = value
+        self._unsynced += 1
+        if not self._batch_depth and self._unsynced >= self.batch_size:
+            self.sync()
+
+    def __contains__(self, key):
+        return key in self._db
+
+    def __len__(self):
+        return len(self._db)
+
+    def __iter__(self):
+        return iter(self._db)
+
+    def get(self, key, default=None):
+        return self._db.get(key, default)
+
+    def items(self):
+        return self._db.items()
+
+    def update(self, items):
+        with self.batch():
+            for key, value in dict(items).items():
+                self[key] = value
+
+    def range(self, start, end):
+        if not self.index_dates:
+            raise TypeError('keys are not indexed by date')
+        start, end = _iso(start), _iso(end)
+        dates = ((date_key(key), key) for key in self._db)
+        dates = sorted((d, key) for (d, key) in dates
+                       if d is not None and start <= d <= end)
+        for _, key in dates:
+            yield key, self._db[key]
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.sync()
+
+    def sync(self):
+        for store in self.depends:
+            store.sync()
+        self._db.sync()
+        self._unsynced = 0
+
+    def close(self):
+        self._db.close()
+
+
+BACKENDS = {
+    'sqlite': (SQLiteCache, '.sqlite'),
+    'shelve': (ShelveCache, '.db'),
+}
+
+
+def open_cache(name, backend=None, **kwargs):
+    """
+    Open a cache with the given backend.
+
+    Args:
+        name (str):
+            Path of the cache without extension. The extension depends on the
+            backend: '.sqlite' for 'sqlite' and '.db' for 'shelve'.
+        backend (str):
+            Either 'sqlite' or 'shelve'. Defaults to CACHE_BACKEND.
+
+    When a new SQLite cache is created and a shelve with the same name
+    exists, its contents are migrated to the new cache.
+
+    Other keyword arguments are passed to the cache class.
+    """
+
+    backend = backend or CACHE_BACKEND
+    try:
+        cls, ext = BACKENDS[backend]
+    except KeyError:
+        raise ValueError('invalid cache backend: %r' % backend)
+
+    path = name + ext
+    is_new = not os.path.exists(path)
+    cache = cls(path, **kwargs)
+    if backend == 'sqlite' and is_new and dbm.whichdb(name + '.db'):
+        migrate_shelve(name + '.db', cache)
+    return cache
+
+
+def migrate_shelve(path, cache):
+    """
+    Copy all items from the shelve in the given path to cache in a single
+    transaction.
+    """
+
+    with shelve.open(path, 'r') as db, cache.batch():
+        for key in db:
+            cache[key] = db[key]
+    return cache
@@ -0,0 +1,161 @@
+"""
+Bags of words and coherence between the proposals and speeches of each
+congressman.
+"""
+
+import json
+import logging
+import sys
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from . import streams
+
+LOG_FILE = 'word-processing.log'
+
+EMPTY_VOCABULARY = ('empty vocabulary; perhaps the documents only contain '
+                    'stop words')
+
+
+def tokenizer(keywords):
+    """
+    tokenizer to get sentences between commas instead of words
+    """
+    tokens = keywords.split(', ')
+    tokens = filter(lambda x: not x.isspace(), tokens)
+    tokens = filter(lambda x: len(x) > 0, tokens)
+    return tokens
+
+
+# List indexes for proposals and speeches
+PROPOSALS = 0
+SPEECHES = 1
+
+
+def raw_texts(cm):
+    """
+    Return a list with the proposals and speeches keywords of a congressman
+    joined in two strings.
+    """
+    return [", ".join(cm['proposals']), ", ".join(cm['speeches'])]
+
+
+def row_bag_of_words(matrix, row, features):
+    """
+    Return a dict mapping words to counts for a row of a CSR matrix.
+    """
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    indices = matrix.indices[start:end]
+    counts = matrix.data[start:end]
+    return {features[i]: int(n) for (i, n) in zip(indices, counts) if n > 0}
+
+
+def coherence(congressmen):
+    """
+    Replace proposals and speeches of each congressman by their bags of words
+    and compute the cosine similarity between them as 'coherence'.
+
+    A single CountVectorizer is fitted over the texts of all congressmen, so
+    rows 2 * i + PROPOSALS and 2 * i + SPEECHES of the resulting sparse matrix
+    correspond to the i-th congressman. Congressmen without any words are
+    logged and do not receive a coherence value.
+
+    Results are identical to fitting a vectorizer over the texts of each
+    congressman: the cosine is computed by sklearn's cosine_similarity over
+    the columns of the words used by the congressman, in the same order.
+    """
+    names = list(congressmen)
+    docs = []
+    for cm in names:
+        docs.extend(raw_texts(congressmen[cm]))
+
+    vectorizer = CountVectorizer(tokenizer=tokenizer)
+    try:
+        matrix = vectorizer.fit_transform(docs).tocsr()
+    except ValueError as e:
+        for cm in names:
+            logging.warning(e)
+            congressmen[cm]['proposals'] = dict()
+            congressmen[cm]['speeches'] = dict()
+        return congressmen
+
+    features = [None] * len(vectorizer.vocabulary_)
+    for word, idx in vectorizer.vocabulary_.items():
+        features[idx] = word
+
+    for i, cm in enumerate(names):
+        proposals = 2 * i + PROPOSALS
+        speeches = 2 * i + SPEECHES
+        rows = matrix[2 * i:2 * i + 2]
+        columns = np.unique(rows.indices)
+        if len(columns):
+            vector = rows[:, columns].toarray()
+            cosine = cosine_similarity(vector)[PROPOSALS][SPEECHES]
+            congressmen[cm]['coherence'] = float(cosine)
+        else:
+            logging.warning(EMPTY_VOCABULARY)
+        congressmen[cm]['proposals'] = row_bag_of_words(matrix, proposals,
+                                                        features)
+        congressmen[cm]['speeches'] = row_bag_of_words(matrix, speeches,
+                                                       features)
+    return congressmen
+
+
+def read_jsonl(filename):
+    """
+    Iterate over the (name, data) pairs of a JSON Lines file written by
+    fetch.py, reading one congressman at a time.
+    """
+    for data in streams.read_jsonl(filename):
+        yield data.pop('congressman'), data
+
+
+def write_jsonl(records, filename):
+    """
+    Write (name, data) pairs to a JSON Lines file as they are produced.
+    """
+    streams.write_jsonl((dict(data, congressman=cm) for (cm, data) in records),
+                        filename)
+
+
+def iter_coherence(records):
+    """
+    Streaming version of coherence(): process one (name, data) pair at a
+    time. Results are the same, since the bag of words and coherence of a
+    congressman do not depend on the others.
+    """
+    for cm, data in records:
+        yield cm, coherence({cm: data})[cm]
+
+
+def main(input='data.json', output='final.json'):
+    """
+    Read congressmen from input and write the results to output.
+
+    If both files end with .jsonl (or are '-' for the standard input and
+    output), congressmen are streamed one at a time and memory usage does not
+    depend on the size of the input.
+    """
+    logging.basicConfig(filename=LOG_FILE, level=logging.WARNING)
+    if streams.is_jsonl(input) and streams.is_jsonl(output):
+        write_jsonl(iter_coherence(read_jsonl(input)), output)
+        return
+
+    if streams.is_jsonl(input):
+        congressmen = dict(read_jsonl(input))
+    else:
+        with open(input, 'r') as data_file:
+            congressmen = json.load(data_file)
+
+    coherence(congressmen)
+
+    if streams.is_jsonl(output):
+        write_jsonl(congressmen.items(), output)
+    else:
+        with open(output, 'w', encoding='utf-8') as outfile:
+            outfile.write(json.dumps(congressmen, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,383 @@
+"""
+On-disk corpus of stemmed documents.
+
+A corpus is a directory with:
+
+* ``corpus.json``: the options used to stemize the documents.
+* ``vocabulary.txt``: one stem per line. The stem id is the line number.
+* ``stems.u32``: the stem ids of all documents, one after the other, as
+  little-endian uint32.
+* ``offsets.i64``: little-endian int64 offsets of each document in
+  ``stems.u32``, plus the total number of stems. Document i has the stems
+  ``stems[offsets[i]:offsets[i + 1]]``.
+* ``vocabulary.i64``: little-endian int64 number of stems in the vocabulary
+  before the first document and after each document.
+
+This is the layout of a CSR matrix without the data array. Arrays are
+memory-mapped, so opening a corpus does not read it and worker processes
+share the same pages. New documents are appended to the end of each file.
+The offsets file is written last: data written by an interrupted append
+after the last committed document (including vocabulary lines) is ignored
+when the corpus is opened and overwritten by the next append.
+"""
+
+import json
+import os
+from collections import Counter
+from math import log
+
+import numpy as np
+from scipy import sparse
+
+from tenhodito_nlp import profiling
+from tenhodito_nlp.stemming import stemize
+
+FORMAT_VERSION = 1
+STEMS_DTYPE = np.dtype('<u4')
+OFFSETS_DTYPE = np.dtype('<i8')
+METHODS = ('boolean', 'frequency', 'count', 'weighted')
+
+
+def _memmap(path, dtype):
+    """
+    Return a read-only memory map of a binary file. Empty files, which
+    cannot be mapped, are returned as empty arrays. Bytes after the last
+    complete item are ignored.
+    """
+
+    size = os.path.getsize(path) // dtype.itemsize
+    if size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(size,))
+
+
+class Corpus:
+    """
+    A corpus of stemmed documents stored in a directory.
+
+    Documents are accessed by position as lists of stems. The corpus also
+    implements the matrix methods of :class:`tenhodito_nlp.nlp.NLPJob`
+    (sparse_matrix, words, vocabulary, weights, ...), so it can be used in
+    its place by :func:`tenhodito_nlp.nlp.kmeans`, :func:`kmeans_sweep` and
+    :class:`tenhodito_nlp.search.SimilarityIndex`. Matrices are computed
+    from the memory-mapped arrays without creating Python objects for each
+    stem.
+
+    Only one process may append to a corpus at a time. Readers in other
+    processes see new documents after calling :meth:`refresh`.
+
+    Args:
+        path (str):
+            Corpus directory.
+        mode (str):
+            'r' opens an existing corpus for reading and 'a' also allows
+            appending, creating an empty corpus if path does not exist.
+        stop_words, ngrams:
+            Options used to stemize texts in :meth:`add_texts`. They are only
+            used when a new corpus is created and are read from disk
+            otherwise.
+        method (str):
+            Default method of :meth:`sparse_matrix`.
+    """
+
+    def __init__(self, path, mode='r', stop_words=None, ngrams=1,
+                 method='weighted'):
+        if mode not in ('r', 'a'):
+            raise ValueError('invalid mode: %r' % mode)
+        self.path = path
+        self.mode = mode
+        self.method = method
+        if not os.path.exists(self._file('corpus.json')):
+            if mode == 'r':
+                raise FileNotFoundError('no corpus in %r' % path)
+            self._create(stop_words, ngrams)
+        with open(self._file('corpus.json')) as fd:
+            meta = json.load(fd)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError('unsupported corpus version: %r'
+                             % meta['version'])
+        self._stop_words = meta['stop_words']
+        self._ngrams = meta['ngrams']
+        self.refresh()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        stems = self._stems
+        return [stems[i] for i in self.stem_ids(idx)]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return '%s(%r, %d documents)' % (type(self).__name__, self.path,
+                                         len(self))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _create(self, stop_words, ngrams):
+        """
+        Create the files of an empty corpus.
+        """
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        open(self._file('vocabulary.txt'), 'w').close()
+        open(self._file('stems.u32'), 'wb').close()
+        for name in ['offsets.i64', 'vocabulary.i64']:
+            with open(self._file(name), 'wb') as fd:
+                fd.write(np.zeros(1, dtype=OFFSETS_DTYPE).tobytes())
+        meta = {'version': FORMAT_VERSION, 'ngrams': ngrams,
+                'stop_words': None if stop_words is None else list(stop_words)}
+        with open(self._file('corpus.json'), 'w') as fd:
+            json.dump(meta, fd)
+
+    def refresh(self):
+        """
+        Map the files again to see documents appended by other processes.
+        """
+
+        self._offsets = _memmap(self._file('offsets.i64'), OFFSETS_DTYPE)
+        self._ids = _memmap(self._file('stems.u32'), STEMS_DTYPE)
+        sizes = _memmap(self._file('vocabulary.i64'), OFFSETS_DTYPE)
+        n_stems = int(sizes[len(self._offsets) - 1])
+        with open(self._file('vocabulary.txt'), 'rb') as fd:
+            lines = fd.read().split(b'\n')[:n_stems]
+
+        # Lines after the vocabulary of the last committed document were
+        # written by an interrupted append and are not used by any document.
+        self._vocabulary_size = sum(len(line) + 1 for line in lines)
+        self._stems = [line.decode('utf-8') for line in lines]
+        self._index = None
+        self._matrices = {}
+        self._words = None
+        self._vocabulary = None
+
+    @property
+    def offsets(self):
+        """
+        Memory-mapped array with the offsets of each document.
+        """
+
+        return self._offsets
+
+    def stem_ids(self, idx):
+        """
+        Return a memory-mapped array with the stem ids of the idx-th document.
+        """
+
+        idx = range(len(self))[idx]
+        start, stop = self._offsets[idx], self._offsets[idx + 1]
+        return self._ids[start:stop]
+
+    def stems(self):
+        """
+        Return the list of stems ordered by id.
+        """
+
+        return list(self._stems)
+
+    def append(self, documents):
+        """
+        Append documents given as lists of stems to the end of the corpus.
+
+        Existing data is not rewritten: new stems are appended to the
+        vocabulary, then the stem ids, the vocabulary sizes and finally the
+        offsets of the new documents.
+        """
+
+        if self.mode != 'a':
+            raise ValueError('corpus is opened for reading only')
+        if self._index is None:
+            self._index = {stem: i for (i, stem) in enumerate(self._stems)}
+        index = self._index
+        try:
+            self._append(documents, index)
+        except BaseException:
+            # The index may have stems of documents that were not committed
+            self._index = None
+            raise
+        self.refresh()
+        self._index = index
+
+    def _append(self, documents, index):
+        """
+        Internal: write the documents, adding their new stems to index.
+        """
+
+        n_stems = len(self._stems)
+        end = int(self._offsets[-1])
+        ids, offsets, sizes = [], [], []
+        for document in documents:
+            ids.extend(index.setdefault(stem, len(index))
+                       for stem in document)
+            offsets.append(end + len(ids))
+            sizes.append(len(index))
+        if not offsets:
+            return
+
+        # Data left by an interrupted append is overwritten
+        new_stems = list(index)[n_stems:]
+        data = ''.join(stem + '\n' for stem in new_stems).encode('utf-8')
+        _write_at(self._file('vocabulary.txt'), self._vocabulary_size, data)
+        _write_at(self._file('stems.u32'), end * STEMS_DTYPE.itemsize,
+                  np.array(ids, dtype=STEMS_DTYPE).tobytes())
+        position = len(self._offsets) * OFFSETS_DTYPE.itemsize
+        _write_at(self._file('vocabulary.i64'), position,
+                  np.array(sizes, dtype=OFFSETS_DTYPE).tobytes())
+        _write_at(self._file('offsets.i64'), position,
+                  np.array(offsets, dtype=OFFSETS_DTYPE).tobytes())
+
+    @profiling.instrumented('stemming')
+    def add_texts(self, texts):
+        """
+        Stemize the given text strings with the corpus' options and append
+        them to the corpus.
+        """
+
+        self.append(stemize(text, stop_words=self._stop_words,
+                            ngrams=self._ngrams)
+                    for text in texts)
+
+    @classmethod
+    def from_texts(cls, path, texts, stop_words=None, ngrams=1):
+        """
+        Create a corpus in the given path from an iterable of text strings.
+        """
+
+        corpus = cls(path, 'a', stop_words=stop_words, ngrams=ngrams)
+        corpus.add_texts(texts)
+        return corpus
+
+    def _counts(self):
+        """
+        Return the document-term count matrix with columns in stem id order.
+        """
+
+        ids = np.asarray(self._ids[:self._offsets[-1]])
+        data = np.ones(len(ids), dtype=float)
+        shape = (len(self), len(self._stems))
+        matrix = sparse.csr_matrix((data, ids, np.asarray(self._offsets)),
+                                   shape=shape)
+        matrix.sum_duplicates()
+        return matrix
+
+    def document_frequency(self):
+        """
+        Return a Counter with the number of documents in which each stem
+        appears.
+        """
+
+        counts = self.sparse_matrix('count')
+        frequencies = np.bincount(counts.indices, minlength=counts.shape[1])
+        return Counter(dict(zip(self.words(), frequencies.tolist())))
+
+    def words(self):
+        """
+        Return a sorted list of the stems in the corpus, as in
+        :meth:`NLPJob.words`.
+        """
+
+        if self._words is None:
+            self._words = sorted(set(self._stems))
+        return list(self._words)
+
+    def vocabulary(self):
+        """
+        Return a dictionary mapping each stem to its column index in the
+        document-term matrix, as in :meth:`NLPJob.vocabulary`.
+        """
+
+        if self._vocabulary is None:
+            words = self.words()
+            self._vocabulary = {stem: i for (i, stem) in enumerate(words)}
+        return self._vocabulary
+
+    def weights(self):
+        """
+        Return a dictionary with the inverse document frequency of each stem,
+        as in :meth:`NLPJob.weights`.
+        """
+
+        N = len(self)
+        return {stem: log(N / freq)
+                for (stem, freq) in self.document_frequency().items()}
+
+    def sparse_matrix(self, method=None):
+        """
+        Return the document-term matrix as a :class:`scipy.sparse.csr_matrix`.
+
+        The result is the same as :meth:`NLPJob.sparse_matrix` for a job with
+        the same documents: columns are ordered as self.words().
+        """
+
+        if method is None:
+            method = self.method
+        if method not in METHODS:
+            raise ValueError('invalid method: %r' % method)
+        try:
+            matrix = self._matrices[method]
+        except KeyError:
+            profiling.count('matrix', hit=False)
+        else:
+            profiling.count('matrix', hit=True)
+            return matrix
+
+        with profiling.stage('matrix'):
+            if method == 'count':
+                # Stem ids follow the order of first occurrence. Columns are
+                # sorted by stem.
+                vocabulary = self.vocabulary()
+                column = np.array([vocabulary[stem] for stem in self._stems],
+                                  dtype=np.int32)
+                counts = self._counts()
+                matrix = sparse.csr_matrix(
+                    (counts.data, column[counts.indices], counts.indptr),
+                    shape=(len(self), len(vocabulary)))
+                matrix.sort_indices()
+            elif method == 'boolean':
+                matrix = self.sparse_matrix('count').copy()
+                matrix.data[:] = 1
+            elif method == 'frequency':
+                matrix = self.sparse_matrix('count')
+                totals = np.asarray(matrix.sum(axis=1)).ravel()
+                totals[totals == 0] = 1
+                matrix = matrix.multiply(1 / totals[:, None])
+                matrix = sparse.csr_matrix(matrix)
+            else:
+                frequencies = np.bincount(self.sparse_matrix('count').indices,
+                                          minlength=len(self.words()))
+                with np.errstate(divide='ignore'):
+                    scale = np.log(len(self) / frequencies)
+                scale[frequencies == 0] = 1
+                matrix = self.sparse_matrix('frequency')
+                matrix = sparse.csr_matrix(matrix.multiply(scale[None, :]))
+            self._matrices[method] = matrix
+        return matrix
+
+    def matrix(self, dense=False):
+        """
+        Same as :meth:`NLPJob.matrix`.
+        """
+
+        matrix = self.sparse_matrix()
+        if dense:
+            return matrix.toarray()
+        return matrix
+
+
+def _write_at(path, position, data):
+    """
+    Truncate a file at the given position, write data at its end and flush
+    it to disk.
+    """
+
+    with open(path, 'r+b') as fd:
+        fd.truncate(position)
+        fd.seek(position)
+        fd.write(data)
+        fd.flush()
+        os.fsync(fd.fileno())
@@ -0,0 +1,584 @@
+"""
+Crawler for congressmen data, proposals and speeches in the Câmara API.
+"""
+
+import logging
+import json
+import argparse
+import datetime
+import shelve
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from io import BytesIO
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+from . import streams
+from .metrics import Metrics
+
+LOG_FILE = 'retrieve.log'
+
+# API URI variables
+CAMARA_BASE_URL = 'http://www.camara.leg.br'
+API_ENTRY_POINT = '/SitCamaraWS'
+API_GET_CONGRESSMEN = '/Deputados.asmx/ObterDeputados'
+API_GET_PROPOSALS = '/Proposicoes.asmx/ListarProposicoes'
+API_GET_PROPOSAL_BY_ID = '/Proposicoes.asmx/ObterProposicaoPorID'
+API_GET_SPEECHES = '/sessoesreunioes.asmx/ListarDiscursosPlenario'
+
+# HTTP client settings
+MAX_WORKERS = 8
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+REQUESTS_PER_SECOND = 10
+TIMEOUT = 60
+
+# Crawl settings
+DATE_FORMAT = '%d/%m/%Y'
+CHECKPOINT_FILE = 'crawl-checkpoint.db'
+CHECKPOINT_SYNC = 50
+
+
+class RateLimiter:
+    """
+    Limit the number of requests per second sent to each host.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        """
+        Block until a new request can be sent to the host of the given url.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def make_session(pool_size=MAX_WORKERS, retries=MAX_RETRIES,
+                 backoff_factor=BACKOFF_FACTOR):
+    """
+    Return a requests session with a pool of keep-alive connections that
+    retries failed requests with exponential backoff.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.packages.urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=backoff_factor,
+                  status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Shared session, created by get_session() on the first request
+session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+rate_limiter = RateLimiter(REQUESTS_PER_SECOND)
+metrics = Metrics()
+
+
+def get_session(pool_size=MAX_WORKERS):
+    """
+    Return the shared session, creating it if necessary.
+
+    The session is created again if its connection pool is smaller than
+    pool_size, so it must be called with the number of concurrent requests
+    before they are sent.
+    """
+    global session, _session_pool_size
+    with _session_lock:
+        if session is None or _session_pool_size < pool_size:
+            if session is not None:
+                session.close()
+            session = make_session(pool_size)
+            _session_pool_size = pool_size
+        return session
+
+
+def api_get(endpoint, params=None):
+    """
+    GET an API endpoint using the shared session and return the response
+    content.
+
+    The latency of each request (not including the time waiting for the rate
+    limiter) is recorded in metrics. Requests that raise or return an HTTP
+    error status are counted as errors.
+    """
+    url = CAMARA_BASE_URL + API_ENTRY_POINT + endpoint
+    name = endpoint.rsplit('/', 1)[-1]
+    rate_limiter.wait(url)
+    start = time.time()
+    try:
+        response = get_session().get(url, params=params, timeout=TIMEOUT)
+    except Exception:
+        metrics.observe(name, time.time() - start, error=True)
+        logging.warning('Could not GET data')
+        raise
+    metrics.observe(name, time.time() - start,
+                    error=response.status_code >= 400)
+    return response.content
+
+
+def fetch_all_congressmen():
+    """
+    returns a XML with all congressmen data
+    """
+    return api_get(API_GET_CONGRESSMEN)
+
+
+def fetch_cm_proposals(cm_name, cm_party, cm_state, start_date, end_date):
+    payload = {'sigla': '',  # Set this to 'PL' to retrieve only Law Proposals
+               'numero': '',
+               'ano': '',
+               'datApresentacaoIni': start_date,
+               'datApresentacaoFim': end_date,
+               'parteNomeAutor': cm_name,
+               'idTipoAutor': '',
+               'siglaPartidoAutor': cm_party,
+               'siglaUFAutor': cm_state,
+               'generoAutor': '',
+               'codEstado': '',
+               'codOrgaoEstado': '',
+               'emTramitacao': ''}
+    return api_get(API_GET_PROPOSALS, payload)
+
+
+def fetch_proposal_by_id(proposal_id):
+    payload = {'idProp': proposal_id}
+    return api_get(API_GET_PROPOSAL_BY_ID, payload)
+
+
+def fetch_cm_speeches(cm_name, cm_party, cm_state, start_date, end_date):
+    payload = {'dataIni': start_date,
+               'dataFim': end_date,
+               'codigoSessao': '',
+               'parteNomeParlamentar': cm_name,
+               'siglaPartido': cm_party,
+               'siglaUF': cm_state}
+    return api_get(API_GET_SPEECHES, payload)
+
+
+def _local_name(tag):
+    """
+    Return tag name without the namespace.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def _cdata(elem):
+    """
+    Return the character data of an element, as untangle's .cdata.
+    """
+    return (elem.text or '') + ''.join(child.tail or '' for child in elem)
+
+
+def iter_records(content, tag, fields):
+    """
+    Incrementally parse a XML response and yield a dict with the character
+    data of the given child fields for each element with the given tag.
+
+    Elements are cleared as soon as they are read, so memory usage does not
+    depend on the size of the response.
+    """
+    fields = set(fields)
+    stack = []
+    n_open = 0  # number of open elements with the given tag
+    events = ElementTree.iterparse(BytesIO(content), events=('start', 'end'))
+    for event, elem in events:
+        is_record = _local_name(elem.tag) == tag
+        if event == 'start':
+            stack.append(elem)
+            n_open += is_record
+            continue
+
+        stack.pop()
+        if is_record:
+            n_open -= 1
+            record = {}
+            for child in elem:
+                name = _local_name(child.tag)
+                if name in fields:
+                    record[name] = _cdata(child)
+            yield record
+        elif n_open:
+            continue  # a field of an open record
+
+        # Discard elements that were already read
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+CM_FIELDS = {'nomeParlamentar': None,
+             'nome': 'name',
+             'urlFoto': 'photo',
+             'uf': 'state',
+             'partido': 'party',
+             'fone': 'phone',
+             'email': 'email'}
+
+
+def get_cm_dict():
+    congressmen = dict()
+    try:
+        records = iter_records(fetch_all_congressmen(), 'deputado', CM_FIELDS)
+        for record in records:
+            cm = dict()
+            for field, key in CM_FIELDS.items():
+                if key is not None:
+                    cm[key] = record.get(field, '')
+            cm['proposals'] = []
+            cm['speeches'] = []
+            congressmen[record['nomeParlamentar']] = cm
+    except (IndexError, KeyError) as e:
+        logging.warning(e)
+
+    return congressmen
+
+
+def get_cm_proposal_ids(congressmen, cm, start_date, end_date):
+    """
+    Return the list of proposal ids for the given congressman.
+    """
+    content = fetch_cm_proposals(cm,
+                                 congressmen[cm]['party'],
+                                 congressmen[cm]['state'],
+                                 start_date,
+                                 end_date)
+    return [record['id']
+            for record in iter_records(content, 'proposicao', ['id'])]
+
+
+def get_proposal_indexation(proposal_id):
+    """
+    Return the indexation text of a proposal or None if it is not available.
+    """
+    content = fetch_proposal_by_id(proposal_id)
+    for record in iter_records(content, 'proposicao', ['Indexacao']):
+        try:
+            return record['Indexacao']
+        except KeyError as e:
+            logging.warning(e)
+
+
+def get_cm_speeches(congressmen, cm, start_date, end_date):
+    """
+    Return the list of speech indexations for the given congressman.
+    """
+    content = fetch_cm_speeches(cm,
+                                congressmen[cm]['party'],
+                                congressmen[cm]['state'],
+                                start_date,
+                                end_date)
+    return [record['txtIndexacao']
+            for record in iter_records(content, 'discurso', ['txtIndexacao'])]
+
+
+def get_proposals(congressmen, start_date, end_date):
+    """
+    Retrieve proposals and append to congressmen dict.
+    Dates must be in DD/MM/YYYY format
+    """
+    for cm in congressmen:
+        try:
+            ids = get_cm_proposal_ids(congressmen, cm, start_date, end_date)
+            for proposal_id in ids:
+                indexation = get_proposal_indexation(proposal_id)
+                if indexation is not None:
+                    congressmen[cm]['proposals'].append(indexation)
+
+        except Exception as e:
+            logging.warning("'%s'\n\tfor: %s" % (e, cm))
+
+
+def get_speeches(congressmen, start_date, end_date):
+    """
+    Retrieve speeches and append to congressmen dict.
+    Note that API only allows retrieving 360 days of speeches.
+    Dates must be in DD/MM/YYYY format
+    """
+    for cm in congressmen:
+        try:
+            speeches = get_cm_speeches(congressmen, cm, start_date, end_date)
+            congressmen[cm]['speeches'].extend(speeches)
+
+        except Exception as e:
+            logging.warning(e)
+
+
+class Checkpoint:
+    """
+    On-disk store of finished crawl work units.
+
+    Behaves like a dictionary mapping unit keys (see unit_key()) to their
+    results. The underlying shelve is synchronized after every sync_every
+    writes, and when the checkpoint is closed.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE, sync_every=CHECKPOINT_SYNC):
+        self.sync_every = sync_every
+        self._db = shelve.open(path)
+        self._unsynced = 0
+
+    def __contains__(self, key):
+        return key in self._db
+
+    def __getitem__(self, key):
+        return self._db[key]
+
+    def __setitem__(self, key, value):
+        self._db[key] = value
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self._db.sync()
+        self._unsynced = 0
+
+    def close(self):
+        self._db.close()
+
+
+def unit_key(endpoint, *args):
+    """
+    Return the checkpoint key for a work unit.
+    """
+    return '::'.join([endpoint.rsplit('/', 1)[-1]] + list(args))
+
+
+def date_windows(start_date, end_date):
+    """
+    Split an interval of DD/MM/YYYY dates into windows aligned with calendar
+    months. Only the first and last windows may be partial months.
+    """
+    start = datetime.datetime.strptime(start_date, DATE_FORMAT).date()
+    end = datetime.datetime.strptime(end_date, DATE_FORMAT).date()
+    windows = []
+    while start <= end:
+        if start.month == 12:
+            next_month = datetime.date(start.year + 1, 1, 1)
+        else:
+            next_month = datetime.date(start.year, start.month + 1, 1)
+        stop = min(end, next_month - datetime.timedelta(days=1))
+        windows.append((start.strftime(DATE_FORMAT),
+                        stop.strftime(DATE_FORMAT)))
+        start = next_month
+    return windows
+
+
+def crawl(start_date, end_date, max_workers=MAX_WORKERS, checkpoint=None):
+    """
+    Concurrent version of get_cm_dict(), get_proposals() and get_speeches().
+
+    Requests are sent by a pool of max_workers threads sharing the same
+    session. Results are merged in deputy order, so the returned congressmen
+    dict is the same as in the sequential version.
+
+    If a Checkpoint is given, the date range is split into monthly windows
+    (see date_windows()) and every finished deputy x endpoint x window unit
+    and every proposal id is saved to it. Units found in the checkpoint are
+    not fetched again, so an interrupted crawl can be resumed and a crawl
+    over an overlapping date range only fetches the missing units. Failed
+    units are logged and are not saved.
+    """
+    congressmen = dict()
+    for cm, data in iter_crawl(start_date, end_date, max_workers, checkpoint):
+        congressmen[cm] = data
+    return congressmen
+
+
+def iter_crawl(start_date, end_date, max_workers=MAX_WORKERS,
+               checkpoint=None, batch_size=None):
+    """
+    Same as crawl(), but yield (name, data) pairs for each congressman.
+
+    Congressmen are crawled in batches of batch_size (all at once, by
+    default) and only the results of the current batch are kept in memory.
+    """
+    get_session(max_workers)
+    congressmen = get_cm_dict()
+    names = list(congressmen)
+    if checkpoint is None:
+        windows = [(start_date, end_date)]
+    else:
+        windows = date_windows(start_date, end_date)
+    batch_size = batch_size or len(names) or 1
+
+    for i in range(0, len(names), batch_size):
+        batch = names[i:i + batch_size]
+        store = {} if checkpoint is None else checkpoint
+        _crawl_batch(congressmen, batch, windows, store, max_workers)
+
+        for cm in batch:
+            data = congressmen.pop(cm)
+            for start, end in windows:
+                key = unit_key(API_GET_PROPOSALS, cm, start, end)
+                for pid in (store[key] if key in store else ()):
+                    pkey = unit_key(API_GET_PROPOSAL_BY_ID, pid)
+                    indexation = store[pkey] if pkey in store else None
+                    if indexation is not None:
+                        data['proposals'].append(indexation)
+                key = unit_key(API_GET_SPEECHES, cm, start, end)
+                if key in store:
+                    data['speeches'].extend(store[key])
+            yield cm, data
+
+
+def _crawl_batch(congressmen, names, windows, store, max_workers):
+    """
+    Fetch all work units for the given congressmen that are not in store and
+    save their results to it.
+    """
+
+    def proposal_ids(cm, start, end):
+        return get_cm_proposal_ids(congressmen, cm, start, end)
+
+    def speeches(cm, start, end):
+        return get_cm_speeches(congressmen, cm, start, end)
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        pending = {}
+        scheduled = set()
+
+        # Units found in the store are counted as cache hits of their
+        # endpoints and units that must be fetched as misses
+        def schedule(key, func, *args):
+            if key in scheduled:
+                return
+            hit = key in store
+            metrics.cache(key.split('::', 1)[0], hit)
+            if not hit:
+                scheduled.add(key)
+                pending[executor.submit(func, *args)] = key
+
+        def schedule_proposals(ids):
+            for pid in ids:
+                key = unit_key(API_GET_PROPOSAL_BY_ID, pid)
+                schedule(key, get_proposal_indexation, pid)
+
+        for cm in names:
+            for start, end in windows:
+                key = unit_key(API_GET_PROPOSALS, cm, start, end)
+                if key in store:
+                    metrics.cache(key.split('::', 1)[0], True)
+                    schedule_proposals(store[key])
+                else:
+                    schedule(key, proposal_ids, cm, start, end)
+                key = unit_key(API_GET_SPEECHES, cm, start, end)
+                schedule(key, speeches, cm, start, end)
+
+        # Results are saved from the main thread only. Workers never wait
+        # for other futures, so there are no deadlocks when proposal details
+        # are scheduled as soon as the list of ids is known.
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    store[key] = value = future.result()
+                except Exception as e:
+                    logging.warning("'%s'\n\tfor: %s" % (e, key))
+                    continue
+                if key.startswith(unit_key(API_GET_PROPOSALS, '')):
+                    schedule_proposals(value)
+
+
+def to_json(congressmen, filename):
+    with open(filename, 'w') as outfile:
+        json.dump(congressmen, outfile, ensure_ascii=False)
+
+
+def to_jsonl(records, filename):
+    """
+    Write (name, data) pairs to a JSON Lines file, one congressman per line,
+    as soon as they are produced. The name is saved in the 'congressman'
+    field.
+    """
+    streams.write_jsonl((dict(data, congressman=cm) for (cm, data) in records),
+                        filename)
+
+
+def get_parser():
+    """
+    Creates a new argument parser.
+    """
+    parser = argparse.ArgumentParser('fetch.py')
+    add_arguments(parser)
+    return parser
+
+
+def add_arguments(parser):
+    """
+    Add the crawler options to an argument parser.
+    """
+    parser.add_argument('start', nargs='?', default='21/07/2015',
+                        help='start date (DD/MM/YYYY)')
+    parser.add_argument('end', nargs='?', default='13/07/2016',
+                        help='end date (DD/MM/YYYY)')
+    parser.add_argument('--output', '-o', default='data.json',
+                        help='output file. Files ending in .jsonl (or - for '
+                             'stdout) are written one congressman at a time')
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help='congressmen crawled at once for .jsonl output')
+    parser.add_argument('--jobs', '--workers', '-j', dest='workers',
+                        type=int, default=MAX_WORKERS,
+                        help='number of concurrent requests')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE,
+                        help='file used to resume interrupted crawls')
+    parser.add_argument('--no-checkpoint', dest='checkpoint',
+                        action='store_const', const=None)
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='write request metrics to FILE in the '
+                             'Prometheus text format during the crawl')
+    parser.add_argument('--metrics-interval', type=float, default=15,
+                        help='seconds between writes of the metrics file')
+
+
+def main(args=None):
+    args = get_parser().parse_args(args)
+    run(args)
+
+
+def run(args):
+    """
+    Run the crawler with options parsed by a parser from get_parser().
+    """
+    logging.basicConfig(filename=LOG_FILE, level=logging.WARNING)
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = Checkpoint(args.checkpoint)
+    metrics.path = args.metrics
+    metrics.interval = args.metrics_interval
+    metrics.start()
+    try:
+        if streams.is_jsonl(args.output):
+            records = iter_crawl(args.start, args.end, args.workers,
+                                 checkpoint, args.batch_size)
+            to_jsonl(records, args.output)
+        else:
+            congressmen = crawl(args.start, args.end, args.workers,
+                                checkpoint)
+            to_json(congressmen, args.output)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        metrics.stop()
+        print(metrics.summary(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
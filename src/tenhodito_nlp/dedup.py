@@ -0,0 +1,295 @@
+import zlib
+from itertools import combinations
+
+import numpy as np
+
+from tenhodito_nlp.stemming import _iter_ngrams, stemize
+
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+THRESHOLD = 0.8
+
+# Universal hashing (a * x + b) % prime over 32 bit shingle hashes. With a, b
+# and x below 2 ** 32 the products never overflow 64 bit integers.
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(data, k=SHINGLE_SIZE, stop_words=None):
+    """
+    Return the set of k-shingles of a text.
+
+    Shingles are the n-grams returned by ``stemize(text, ngrams=k)``. Texts
+    with less than k stems have a single shingle with all their stems.
+
+    Args:
+        data:
+            A string of text or a list of stems.
+        k (int):
+            Number of stems in each shingle.
+        stop_words (list):
+            List of stop words used by :func:`stemize`.
+    """
+
+    if isinstance(data, str):
+        stems = stemize(data, stop_words=stop_words)
+    else:
+        stems = list(data)
+    result = set(_iter_ngrams(stems, k))
+    if not result and stems:
+        result.add(' '.join(stems))
+    return result
+
+
+class MinHash:
+    """
+    Compute MinHash signatures of sets of strings.
+
+    The fraction of equal positions in the signatures of two sets estimates
+    their Jaccard similarity. Signatures computed by instances with the same
+    number of permutations and seed are comparable, even across processes.
+
+    Args:
+        num_perm (int):
+            Number of hash functions (length of the signatures).
+        seed (int):
+            Seed for the random hash functions.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.seed = seed
+        self._a = rng.randint(1, _MAX_HASH, num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MAX_HASH, num_perm).astype(np.uint64)
+
+    def signature(self, items):
+        """
+        Return the signature of an iterable of strings as an array of
+        num_perm integers.
+        """
+
+        hashes = [zlib.crc32(item.encode('utf-8')) for item in items]
+        if not hashes:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = np.array(hashes, dtype=np.uint64)
+        values = (np.outer(hashes, self._a) + self._b) % _PRIME
+        return (values & _MAX_HASH).min(axis=0)
+
+
+def jaccard(u, v):
+    """
+    Estimate the Jaccard similarity of two sets from their MinHash signatures.
+    """
+
+    return float(np.mean(u == v))
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """
+    Return the number of bands for an LSH index with the given threshold.
+
+    Pairs of signatures with Jaccard similarity s share a bucket in at least
+    one of b bands of r rows with probability ``1 - (1 - s ** r) ** b``. We
+    choose b such that the inflection point ``(1 / b) ** (1 / r)`` of this
+    curve is the closest to the threshold.
+    """
+
+    def error(bands):
+        rows = num_perm // bands
+        return abs((1 / bands) ** (1 / rows) - threshold)
+
+    return min(range(1, num_perm + 1), key=error)
+
+
+class MinHashLSH:
+    """
+    Locality sensitive hashing index of MinHash signatures.
+
+    Signatures are split in bands and keys whose signatures are equal in at
+    least one band are candidate pairs. Finding candidates does not compare
+    all pairs of signatures.
+
+    Args:
+        threshold (float):
+            Jaccard similarity used to choose the number of bands.
+        num_perm (int):
+            Length of the signatures.
+        bands (int):
+            Overrides the number of bands computed from threshold.
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=None):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands or lsh_bands(threshold, num_perm)
+        self.rows = num_perm // self.bands
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    def __getitem__(self, key):
+        return self._signatures[key]
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        for i in range(self.bands):
+            yield signature[i * rows:(i + 1) * rows].tobytes()
+
+    def insert(self, key, signature):
+        """
+        Add a key with the given signature to the index.
+        """
+
+        if key in self._signatures:
+            raise ValueError('key already in index: %r' % (key,))
+        self._signatures[key] = signature
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band, []).append(key)
+
+    def remove(self, key):
+        """
+        Remove key from the index.
+        """
+
+        signature = self._signatures.pop(key)
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets[band]
+            bucket.remove(key)
+            if not bucket:
+                del buckets[band]
+
+    def query(self, signature):
+        """
+        Return the set of keys that share at least one band with signature.
+        """
+
+        result = set()
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            result.update(buckets.get(band, ()))
+        return result
+
+    def candidate_pairs(self):
+        """
+        Return the set of (key, key) pairs that share at least one band.
+
+        Keys in each pair are in insertion order.
+        """
+
+        order = {key: i for (i, key) in enumerate(self._signatures)}
+        pairs = set()
+        for buckets in self._buckets:
+            for bucket in buckets.values():
+                for pair in combinations(bucket, 2):
+                    pairs.add(tuple(sorted(pair, key=order.__getitem__)))
+        return pairs
+
+
+class NearDuplicates:
+    """
+    Incremental near-duplicate detection for texts.
+
+    Each text is represented by the MinHash signature of its shingles (see
+    :func:`shingles`). Candidates found by LSH are confirmed when their
+    estimated Jaccard similarity is at least the threshold.
+
+    Args:
+        threshold (float):
+            Minimum Jaccard similarity of near duplicates.
+        num_perm (int):
+            Length of the MinHash signatures.
+        shingle_size (int):
+            Number of stems in each shingle.
+        stop_words (list):
+            List of stop words used to stemize texts.
+        seed (int):
+            Seed for the MinHash functions.
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM,
+                 shingle_size=SHINGLE_SIZE, stop_words=None, seed=1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.stop_words = stop_words
+        self.minhash = MinHash(num_perm, seed)
+        self.lsh = MinHashLSH(threshold, num_perm)
+
+    def __len__(self):
+        return len(self.lsh)
+
+    def __contains__(self, key):
+        return key in self.lsh
+
+    def signature(self, data):
+        """
+        Return the MinHash signature of a string of text or list of stems.
+        """
+
+        items = shingles(data, self.shingle_size, self.stop_words)
+        return self.minhash.signature(items)
+
+    def find(self, data, signature=None):
+        """
+        Return the key of an indexed text that is a near duplicate of data or
+        None if no such text exists.
+
+        When several texts qualify, the most similar one is returned.
+        """
+
+        if signature is None:
+            signature = self.signature(data)
+        best, best_key = self.threshold, None
+        for key in self.lsh.query(signature):
+            value = jaccard(signature, self.lsh[key])
+            if value >= best:
+                best, best_key = value, key
+        return best_key
+
+    def add(self, key, data):
+        """
+        Index data with the given key, unless it is a near duplicate of an
+        indexed text.
+
+        Return the key of the indexed text it duplicates or None if data was
+        added to the index.
+        """
+
+        signature = self.signature(data)
+        duplicate = self.find(data, signature)
+        if duplicate is None:
+            self.lsh.insert(key, signature)
+        return duplicate
+
+    def remove(self, key):
+        """
+        Remove key from the index.
+        """
+
+        self.lsh.remove(key)
+
+
+def near_duplicates(texts, threshold=THRESHOLD, num_perm=NUM_PERM,
+                    shingle_size=SHINGLE_SIZE, stop_words=None, seed=1):
+    """
+    Return a list of (i, j, similarity) tuples with i < j for the pairs of
+    near-duplicate texts in a sequence.
+
+    Similarities are estimated from MinHash signatures and only pairs found
+    by LSH are compared, so the cost is not quadratic in the number of texts.
+    """
+
+    index = NearDuplicates(threshold, num_perm, shingle_size, stop_words, seed)
+    for i, data in enumerate(texts):
+        index.lsh.insert(i, index.signature(data))
+
+    result = []
+    for i, j in sorted(index.lsh.candidate_pairs()):
+        value = jaccard(index.lsh[i], index.lsh[j])
+        if value >= threshold:
+            result.append((i, j, value))
+    return result
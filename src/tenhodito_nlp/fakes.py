@@ -0,0 +1,36 @@
+"""
+Fake data for tests and benchmarks.
+"""
+
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def _factory():
+    from faker import Factory
+
+    return Factory.create(locale='pt-br')
+
+
+def __getattr__(name):
+    # Compatibility with the old module level Faker factory
+    if name == 'fake':
+        return _factory()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def fake_text(paragraphs=None):
+    """
+    Create a string of fake text with several paragraphs.
+
+    Args:
+        paragraphs (int):
+            Optional number of paragraphs.
+    """
+
+    fake = _factory()
+    if paragraphs is None:
+        data = fake.paragraphs()
+    else:
+        data = fake.paragraphs(nb=paragraphs)
+    return '\n\n'.join(data)
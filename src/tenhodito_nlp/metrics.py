@@ -0,0 +1,319 @@
+"""
+Request metrics for the Câmara API crawlers.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Names of the Câmara API endpoints used by the crawlers
+OBTER_DEPUTADOS = 'ObterDeputados'
+LISTAR_PROPOSICOES = 'ListarProposicoes'
+OBTER_PROPOSICAO_POR_ID = 'ObterProposicaoPorID'
+LISTAR_DISCURSOS_PLENARIO = 'ListarDiscursosPlenario'
+FULL_SPEECH = 'ObterInteiroTeorDiscursosPlenario'
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+           60.0)
+PREFIX = 'tenhodito_crawler'
+WRITE_INTERVAL = 15
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets, as in Prometheus.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile by linear interpolation inside the bucket
+        that contains it, as Prometheus' histogram_quantile(). Values above
+        the largest bucket are estimated as its upper bound.
+        """
+
+        if not self.count:
+            return float('nan')
+        rank = q * self.count
+        lower, below = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                if count == below:
+                    return bound
+                fraction = (rank - below) / float(count - below)
+                return lower + (bound - lower) * fraction
+            lower, below = bound, count
+        return self.buckets[-1]
+
+
+class EndpointStats:
+    """
+    Counters and latency histogram of a single endpoint.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency = Histogram(buckets)
+
+    @property
+    def hit_ratio(self):
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / float(total) if total else None
+
+
+class Metrics:
+    """
+    Request counters, error counters, cache hits/misses and latency histograms
+    for each API endpoint.
+
+    If a path is given, metrics are written to it in the Prometheus text
+    format (e.g., for node_exporter's textfile collector) every interval
+    seconds between :meth:`start` and :meth:`stop`, and once more when
+    stopped. Metrics can also be used as a context manager::
+
+        with Metrics('crawl.prom') as metrics:
+            ...
+        print(metrics.summary())
+
+    Args:
+        path (str):
+            Output file. Metrics are only kept in memory if None.
+        interval (float):
+            Seconds between writes.
+        buckets:
+            Upper bounds of the latency histogram buckets in seconds.
+        prefix (str):
+            Prefix of all metric names.
+    """
+
+    def __init__(self, path=None, interval=WRITE_INTERVAL, buckets=BUCKETS,
+                 prefix=PREFIX):
+        self.path = path
+        self.interval = interval
+        self.buckets = buckets
+        self.prefix = prefix
+        self.start_time = time.time()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def endpoint(self, name):
+        """
+        Return the :class:`EndpointStats` of the given endpoint.
+        """
+
+        with self._lock:
+            try:
+                return self._endpoints[name]
+            except KeyError:
+                stats = self._endpoints[name] = EndpointStats(self.buckets)
+                return stats
+
+    def observe(self, name, seconds, error=False):
+        """
+        Record a request to the given endpoint.
+        """
+
+        stats = self.endpoint(name)
+        with self._lock:
+            stats.requests += 1
+            stats.errors += bool(error)
+            stats.latency.observe(seconds)
+
+    def cache(self, name, hit, n=1):
+        """
+        Record n cache hits or misses for the given endpoint.
+        """
+
+        stats = self.endpoint(name)
+        with self._lock:
+            if hit:
+                stats.cache_hits += n
+            else:
+                stats.cache_misses += n
+
+    @contextmanager
+    def time(self, name):
+        """
+        Context manager that records a request to the given endpoint. The
+        request is counted as an error if the block raises an exception.
+        """
+
+        start = _clock()
+        try:
+            yield
+        except Exception:
+            self.observe(name, _clock() - start, error=True)
+            raise
+        self.observe(name, _clock() - start)
+
+    def render(self):
+        """
+        Return all metrics in the Prometheus text format.
+        """
+
+        p = self.prefix
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = []
+
+            def family(name, kind, help, samples):
+                lines.append('# HELP %s_%s %s' % (p, name, help))
+                lines.append('# TYPE %s_%s %s' % (p, name, kind))
+                for suffix, labels, value in samples:
+                    labels = ','.join('%s="%s"' % (k, _escape(v))
+                                      for (k, v) in labels)
+                    labels = '{%s}' % labels if labels else ''
+                    lines.append('%s_%s%s%s %s'
+                                 % (p, name, suffix, labels, _number(value)))
+
+            def counter(name, help, attr):
+                family(name, 'counter', help,
+                       [('', [('endpoint', e)], getattr(stats, attr))
+                        for (e, stats) in endpoints])
+
+            counter('requests_total', 'Requests sent to the API.', 'requests')
+            counter('request_errors_total', 'Requests that failed.', 'errors')
+            counter('cache_hits_total', 'Requests answered by a cache.',
+                    'cache_hits')
+            counter('cache_misses_total', 'Requests not found in a cache.',
+                    'cache_misses')
+
+            samples = []
+            for e, stats in endpoints:
+                hist = stats.latency
+                for bound, count in zip(hist.buckets, hist.counts):
+                    samples.append(('_bucket', [('endpoint', e),
+                                                ('le', _number(bound))],
+                                    count))
+                samples.append(('_bucket', [('endpoint', e), ('le', '+Inf')],
+                                hist.count))
+                samples.append(('_sum', [('endpoint', e)], hist.sum))
+                samples.append(('_count', [('endpoint', e)], hist.count))
+            family('request_duration_seconds', 'histogram',
+                   'Latency of the requests.', samples)
+            family('start_time_seconds', 'gauge',
+                   'Start time of the crawl since the epoch.',
+                   [('', [], self.start_time)])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path=None):
+        """
+        Atomically write all metrics to the given path (defaults to the
+        path given in the constructor).
+        """
+
+        path = path or self.path
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as fd:
+            fd.write(self.render())
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+
+    def start(self):
+        """
+        Start writing metrics to self.path every self.interval seconds in a
+        background thread. Does nothing if there is no path.
+        """
+
+        if self.path is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        """
+        Stop the background thread and write the final metrics.
+        """
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self.path is not None:
+            self.write()
+
+    def summary(self):
+        """
+        Return a table with the requests, error rate, cache hit ratio and
+        latency percentiles of each endpoint.
+        """
+
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        header = ('endpoint', 'requests', 'req/s', 'errors', 'cache',
+                  'p50 (s)', 'p95 (s)', 'max (s)')
+        lines = ['%-34s %9s %7s %7s %7s %8s %8s %8s' % header]
+        with self._lock:
+            for name, stats in sorted(self._endpoints.items()):
+                hist = stats.latency
+                errors = stats.errors / float(stats.requests or 1)
+                ratio = stats.hit_ratio
+                ratio = '-' if ratio is None else '%.1f%%' % (100 * ratio)
+                slowest = _max_bucket(hist)
+                lines.append('%-34s %9d %7.2f %6.1f%% %7s %8.3f %8.3f %8s'
+                             % (name, stats.requests,
+                                stats.requests / elapsed, 100 * errors,
+                                ratio, hist.quantile(0.5),
+                                hist.quantile(0.95), slowest))
+        return '\n'.join(lines)
+
+
+def _max_bucket(hist):
+    """
+    Return the upper bound of the largest non-empty bucket as a string.
+    """
+
+    below = 0
+    result = '-'
+    for bound, count in zip(hist.buckets, hist.counts):
+        if count > below:
+            result = '<=%g' % bound
+        below = count
+    if hist.count > below:
+        result = '>%g' % hist.buckets[-1]
+    return result
+
+
+def _escape(value):
+    value = str(value)
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,488 @@
+"""
+Discourses of each deputy from the Câmara API.
+
+Caches live in CACHE_DIR and are opened on first use. The Câmara API client
+is imported when the first request is sent.
+"""
+
+import datetime
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from tenhodito_nlp import metrics as crawler_metrics
+from tenhodito_nlp import profiling
+from tenhodito_nlp.cache import (CACHE_BACKEND, BlobList, BlobRef, BlobStore,
+                                 open_cache)
+
+CACHE_DIR = '.'
+
+_stores = {}
+_stores_lock = threading.RLock()
+_cached_full_speech_lock = threading.Lock()
+
+
+def set_cache_dir(path):
+    """
+    Set the directory of the discourse store and of the Câmara API caches.
+
+    Stores that are already open are synchronized. They are reopened in the
+    new directory when they are used again.
+    """
+
+    global CACHE_DIR
+    with _stores_lock:
+        for store in _stores.values():
+            store.sync()
+        _stores.clear()
+        CACHE_DIR = path
+
+
+def _cache_path(name):
+    """
+    Return the path of a cache file in CACHE_DIR, creating the directory if
+    necessary.
+    """
+
+    if not os.path.isdir(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+    return os.path.join(CACHE_DIR, name)
+
+
+def _store(name, factory):
+    """
+    Return the store with the given name, opening it on first use.
+    """
+
+    with _stores_lock:
+        try:
+            return _stores[name]
+        except KeyError:
+            store = _stores[name] = factory()
+            return store
+
+
+def _discourse_store():
+    """
+    Return the BlobStore shared by all cached discourses.
+    """
+
+    return _store('discourses',
+                  lambda: BlobStore(_cache_path('discourses.sqlite')))
+
+
+def _full_speech_cache(backend=None):
+    """
+    Return the cache of full speeches with the given backend (see
+    :func:`tenhodito_nlp.cache.open_cache`).
+    """
+
+    backend = backend or CACHE_BACKEND
+    return _store('full-speech:' + backend,
+                  lambda: open_cache(_cache_path('full-speech'),
+                                     backend=backend,
+                                     depends=[_discourse_store()]))
+
+
+def _camara():
+    """
+    Return the Câmara dos Deputados API client.
+    """
+
+    from pygov_br.camara_deputados import cd
+
+    return cd
+
+
+def _cached_full_speech(*args, metrics=None, limit=None, backend=None):
+    """
+    Return the full speech from the Câmara API.
+
+    Results are cached and the 'discurso' field is a :class:`BlobRef` to the
+    text kept in the discourse store. Requests and cache hits are recorded
+    in metrics, if given. If limit is given, the request is sent while
+    holding it (e.g., a semaphore shared by concurrent requests).
+    backend is the backend of the full speech cache.
+    """
+
+    endpoint = crawler_metrics.FULL_SPEECH
+    metrics = metrics or crawler_metrics.Metrics()
+    key = '::'.join(map(str, args))
+    with profiling.stage('cache lookup'), _cached_full_speech_lock:
+        value = _full_speech_cache(backend).get(key)
+    profiling.count('cache lookup', hit=value is not None)
+    metrics.cache(endpoint, hit=value is not None)
+    if value is None:
+        with limit or nullcontext(), profiling.stage('api fetch'), \
+                metrics.time(endpoint):
+            value = _camara().sessions.full_speech(*args)
+
+    # New responses and entries from old caches store the full text
+    if not isinstance(value['discurso'], BlobRef):
+        with profiling.stage('cache write'):
+            ref = _discourse_store().put(value['discurso'])
+            value = dict(value, discurso=ref)
+            with _cached_full_speech_lock:
+                _full_speech_cache(backend)[key] = value
+    return value
+
+
+def _discourse_refs(data):
+    """
+    Return a list of (name, BlobRef) pairs from a list of (name, discourse)
+    pairs. The second element may be a text string, for old cache entries.
+    """
+
+    store = _discourse_store()
+    return [(name, store.put(discourse))
+            for (name, discourse) in data]
+
+
+class DeputyTexts:
+    """
+    Collect discourses and proposals from a deputy.
+
+    Discourses are kept in a :class:`tenhodito_nlp.cache.BlobStore` and
+    the deputy holds only their hashes. Texts are decompressed on access.
+
+    If a :class:`tenhodito_nlp.dedup.NearDuplicates` index is given as
+    ``dedup``, discourses that are near duplicates of a previous discourse
+    are ignored.
+    """
+
+    @property
+    def proposal_text(self):
+        if self._proposal_text is None:
+            self._proposal_text = '\n\n'.join(self.proposals)
+        return self._proposal_text
+
+    @property
+    def discourse_text(self):
+        if self._discourse_text is None:
+            self._discourse_text = '\n\n'.join(self.discourses)
+        return self._discourse_text
+
+    @property
+    def discourses(self):
+        return BlobList(self.store, self.discourse_hashes)
+
+    def __init__(self, name, store=None, dedup=None):
+        self.name = name
+        self.store = BlobStore() if store is None else store
+        self.dedup = dedup
+        self.discourse_hashes = []
+        self.proposals = []
+        self._discourse_index = set()
+        self._proposal_index = set()
+        self._discourse_text = None
+        self._proposal_text = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.name)
+
+    def add_discourse(self, discourse):
+        """
+        Add a new discourse text string or :class:`BlobRef`.
+        """
+
+        self.add_discourses([discourse])
+
+    def add_discourses(self, discourses):
+        """
+        Add several discourses at once.
+        """
+
+        index = self._discourse_index
+        for discourse in discourses:
+            ref = self.store.put(discourse)
+            if ref in index:
+                continue
+            index.add(ref)
+            if self.dedup is not None:
+                if isinstance(discourse, BlobRef):
+                    discourse = self.store[ref]
+                if self.dedup.add(ref, discourse) is not None:
+                    continue
+            self.discourse_hashes.append(ref)
+            self._discourse_text = None
+
+    def add_proposal(self, proposal):
+        """
+        Add a new proposal text string.
+        """
+
+        self.add_proposals([proposal])
+
+    def add_proposals(self, proposals):
+        """
+        Add several proposals at once.
+        """
+
+        index = self._proposal_index
+        for proposal in proposals:
+            if proposal not in index:
+                index.add(proposal)
+                self.proposals.append(proposal)
+                self._proposal_text = None
+
+
+def to_string_date(date):
+    """
+    Convert date to format DD/MM/YYYY
+    """
+
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return '%s/%s/%s' % (date.day, date.month, date.year)
+    return date
+
+
+def to_date(date):
+    """
+    Return date to datetime.date object.
+    """
+
+    if isinstance(date, datetime.date):
+        return date
+    elif date is None:
+        return datetime.date.today()
+    else:
+        dd, mm, yyyy = map(int, date.split('/'))
+        return datetime.date(yyyy, mm, dd)
+
+
+class DiscourseMiner:
+    """
+    Extract deputy discourses.
+
+    Args:
+        max_workers (int):
+            Number of threads used by :meth:`read_interval` to fetch dates
+            and full speeches from the Câmara API. This bounds the number of
+            requests in flight. The default is to fetch one date at a time.
+        cache_backend (str):
+            Backend used by the caches of speeches and full speeches (see
+            :func:`tenhodito_nlp.cache.open_cache`).
+        dedup (float):
+            If given, discourses that are near duplicates of a previous
+            discourse of the same deputy (e.g., re-published under a different
+            session code) are ignored. The value is the Jaccard similarity
+            threshold or True for the default threshold.
+        metrics (Metrics):
+            A :class:`tenhodito_nlp.metrics.Metrics` instance that records
+            requests, latencies and cache hits of each endpoint.
+    """
+
+    def __init__(self, max_workers=1, cache_backend=None, dedup=None,
+                 metrics=None):
+        self._speeches_by_date = open_cache(_cache_path('speeches_by_date'),
+                                            backend=cache_backend,
+                                            index_dates=True,
+                                            depends=[_discourse_store()])
+        self._cache_backend = cache_backend
+        self._lock = threading.Lock()
+        self._limit = nullcontext()
+        self._deputies = {}
+        self.max_workers = max_workers
+        self.dedup = dedup
+        if metrics is None:
+            metrics = crawler_metrics.Metrics()
+        self.metrics = metrics
+
+    def _dbg(self, *args):
+        """
+        Print debug message to stderr, since stdout may be used for output.
+        """
+
+        print(*args, file=sys.stderr)
+
+    def session_list(self):
+        """
+        Return a list of session codes.
+        """
+
+    def read_date(self, date):
+        """
+        Read all discourses in the given date
+        """
+
+        self._add_data(self._load_date(date))
+
+    def _load_date(self, date, executor=None):
+        """
+        Return a list of (name, discourse) pairs for the given date either from
+        the cache or from the Câmara API.
+
+        If an executor is given, full speeches are fetched concurrently.
+        """
+
+        endpoint = crawler_metrics.LISTAR_DISCURSOS_PLENARIO
+        date = to_string_date(date)
+        with profiling.stage('cache lookup'), self._lock:
+            cached = self._speeches_by_date.get(date)
+        profiling.count('cache lookup', hit=cached is not None)
+        self.metrics.cache(endpoint, hit=cached is not None)
+        if cached is not None:
+            return self._cached_refs(date, cached)
+
+        keys = []
+        with self._limit, profiling.stage('api fetch'), \
+                self.metrics.time(endpoint):
+            result = _camara().sessions.speeches(date, date)
+        for api_point in result:
+            cod_session = api_point['codigo']
+            speech_list = api_point['fasesSessao']['faseSessao']
+            speech_list = speech_list['discursos']['discurso']
+
+            if isinstance(speech_list, dict):
+                speech_list = [speech_list]
+
+            for speech in speech_list:
+                insertion = speech['numeroInsercao']
+                room = speech['numeroQuarto']
+                name = speech['orador']['nome']
+                order = speech['orador']['numero']
+                keys.append((name, (cod_session, order, room, insertion)))
+
+        def full_speech(key):
+            name, args = key
+            value = _cached_full_speech(*args, metrics=self.metrics,
+                                        limit=self._limit,
+                                        backend=self._cache_backend)
+            discourse = value['discurso']
+            self._dbg('fetch discourse: %s (%s)' % (name, date))
+            return name, discourse
+
+        if executor is None:
+            data = [full_speech(key) for key in keys]
+        else:
+            data = list(executor.map(full_speech, keys))
+
+        with profiling.stage('cache write'), self._lock:
+            self._speeches_by_date[date] = data
+        return data
+
+    def _cached_refs(self, date, data):
+        """
+        Return cached (name, discourse) pairs for the given date with
+        discourses as BlobRefs. Entries from old caches that store the full
+        texts are rewritten.
+        """
+
+        refs = _discourse_refs(data)
+        if any(not isinstance(d, BlobRef) for (_, d) in data):
+            with self._lock:
+                self._speeches_by_date[date] = refs
+        return refs
+
+    def read_interval(self, start, end=None, max_workers=None):
+        """
+        Read all discourses in the given interval.
+
+        Args:
+            start, end:
+                Dates as datetime.date objects or DD/MM/YYYY strings. End
+                defaults to today.
+            max_workers (int):
+                Overrides the default number of concurrent requests. Dates
+                are fetched concurrently, but discourses are always added in
+                chronological order.
+        """
+
+        start, end = map(to_date, (start, end))
+        days = (end - start).days
+        day = datetime.timedelta(days=1)
+        dates = [start + day * diff for diff in range(days + 1)]
+        max_workers = max_workers or self.max_workers
+
+        # Cached dates are loaded with a single range query
+        with profiling.stage('cache lookup'):
+            cached = dict(self._speeches_by_date.range(start, end))
+        missing = [d for d in dates if to_string_date(d) not in cached]
+        n_cached = len(dates) - len(missing)
+        profiling.count('cache lookup', hit=True, n=n_cached)
+        self.metrics.cache(crawler_metrics.LISTAR_DISCURSOS_PLENARIO, True,
+                           n=n_cached)
+
+        if max_workers <= 1:
+            fetched = {date: self._load_date(date) for date in missing}
+        else:
+            # Date tasks wait for full speech tasks, but not the opposite, so
+            # they run in separate pools to avoid deadlocks. Requests from both
+            # pools share a semaphore, which is only held while a request is
+            # sent, so at most max_workers requests are in flight.
+            self._limit = threading.BoundedSemaphore(max_workers)
+            try:
+                with ThreadPoolExecutor(max_workers) as speech_pool, \
+                        ThreadPoolExecutor(max_workers) as date_pool:
+                    futures = {date: date_pool.submit(self._load_date, date,
+                                                      speech_pool)
+                               for date in missing}
+                    fetched = {date: future.result()
+                               for (date, future) in futures.items()}
+            finally:
+                self._limit = nullcontext()
+        self.sync()
+
+        for date in dates:
+            try:
+                key = to_string_date(date)
+                data = self._cached_refs(key, cached[key])
+            except KeyError:
+                data = fetched[date]
+            self._add_data(data)
+
+    def deputy(self, name):
+        """
+        Return deputy with the given name.
+        """
+
+        try:
+            return self._deputies[name]
+        except KeyError:
+            dedup = None
+            if self.dedup:
+                from tenhodito_nlp.dedup import NearDuplicates, THRESHOLD
+
+                threshold = THRESHOLD if self.dedup is True else self.dedup
+                dedup = NearDuplicates(threshold)
+            deputy = DeputyTexts(name, _discourse_store(), dedup)
+            self._deputies[name] = deputy
+            return deputy
+
+    def deputies(self):
+        """
+        Return a list of deputies.
+        """
+
+        return list(self._deputies.values())
+
+    def add_discourse(self, deputy_name, discourse):
+        """
+        Add a new discourse for the given deputy.
+        """
+
+        deputy = self.deputy(deputy_name)
+        deputy.add_discourse(discourse)
+
+    def _add_data(self, data):
+        """
+        Add a list of (name, discourse) pairs grouping discourses by deputy.
+        """
+
+        by_deputy = {}
+        for name, discourse in data:
+            by_deputy.setdefault(name, []).append(discourse)
+        for name, discourses in by_deputy.items():
+            self.deputy(name).add_discourses(discourses)
+
+    def sync(self):
+        """
+        Synchronize database.
+        """
+
+        with profiling.stage('cache write'):
+            _discourse_store().sync()
+            self._speeches_by_date.sync()
+            _full_speech_cache(self._cache_backend).sync()
@@ -0,0 +1,1174 @@
+"""
+The NLP core: texts, document-term matrices, similarities and clustering.
+"""
+
+import multiprocessing
+from collections import Counter, UserString, deque, namedtuple
+from math import log, sqrt
+
+import numpy as np
+from lazyutils import lazy
+from scipy import sparse
+
+from tenhodito_nlp import profiling
+from tenhodito_nlp.stemming import bag_of_words, stemize
+
+
+def cos_angle(u, v):
+    """
+    Return the cosine of the angle between two vectors.
+    """
+
+    return u.dot(v) / (norm(u) * norm(v))
+
+
+def norm(u):
+    """
+    Euclidean norm of vector u.
+    """
+
+    return sqrt((u * u).sum())
+
+
+def similarity(u, v, method='triangular'):
+    """
+     Return a normalized measure of similarity between two vectors.
+
+    The resulting value is between 0 (no similarity) and 1 (identity).
+    """
+
+    if method == 'angle':
+        return (cos_angle(u, v) + 1) / 2
+    elif method == 'triangular':
+        norm_u = norm(u)
+        norm_v = norm(v)
+        if norm_u == norm_v == 0:
+            return 1.0
+        return 1 - norm(u - v) / (norm_u + norm_v)
+    else:
+        raise ValueError('invalid similarity method: %r' % method)
+
+
+def similarity_blocks(matrix, method='triangular', block_size=512):
+    """
+    Compute the similarity between all rows of a matrix in blocks of rows.
+
+    Yields (start, block) pairs, where block is a dense array with the
+    similarities between rows start:start + block_size and all rows of the
+    matrix. Only one block is kept in memory at a time.
+
+    Args:
+        matrix:
+            A 2D :class:`numpy.array` or a :mod:`scipy.sparse` matrix.
+        method (str):
+            Same meaning as in the :func:`similarity` function.
+        block_size (int):
+            Maximum number of rows in each block.
+    """
+
+    if method not in ('angle', 'triangular'):
+        raise ValueError('invalid similarity method: %r' % method)
+
+    if sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+        sq_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+    else:
+        matrix = np.asarray(matrix, dtype=float)
+        sq_norms = (matrix * matrix).sum(axis=1)
+    norms = np.sqrt(sq_norms)
+    transposed = matrix.T
+    N = matrix.shape[0]
+
+    for start in range(0, N, block_size):
+        stop = min(start + block_size, N)
+        gram = matrix[start:stop].dot(transposed)
+        if sparse.issparse(gram):
+            gram = gram.toarray()
+        gram = np.asarray(gram, dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if method == 'angle':
+                block = gram / (norms[start:stop, None] * norms[None, :])
+                block = (block + 1) / 2
+            else:
+                sq_dist = sq_norms[start:stop, None] + sq_norms[None, :]
+                sq_dist -= 2 * gram
+                np.maximum(sq_dist, 0, out=sq_dist)
+                norm_sum = norms[start:stop, None] + norms[None, :]
+                block = 1 - np.sqrt(sq_dist) / norm_sum
+                block[norm_sum == 0] = 1.0
+
+        # Documents are always identical to themselves
+        rows = np.arange(stop - start)
+        block[rows, rows + start] = 1.0
+        yield start, block
+
+
+@profiling.instrumented('similarity')
+def similarity_matrix(matrix, method='triangular', block_size=512):
+    """
+    Return the similarity matrix for all pairs of rows of the given matrix.
+
+    This is a vectorized version of calling :func:`similarity` for each pair
+    of rows. Computation is performed in blocks of rows (see
+    :func:`similarity_blocks`) so memory used by intermediate results does not
+    grow with the square of the number of rows.
+    """
+
+    N = matrix.shape[0]
+    result = np.empty([N, N], dtype=float)
+    for start, block in similarity_blocks(matrix, method, block_size):
+        result[start:start + len(block)] = block
+    return result
+
+
+def _check_data(data):
+    """
+    Internal: raise a TypeError if data is not a string.
+    """
+
+    if not isinstance(data, (str, UserString)):
+        raise TypeError('text data must be a string, got %s. Use '
+                        'stems=iter_stems(file) to stemize file objects'
+                        % type(data).__name__)
+
+
+class Text(UserString):
+    """
+    Represents a text with metadata from NLP.
+
+    The data must be a string. Stems are computed with :func:`stemize`,
+    unless they are given explicitly in the ``stems`` argument as any
+    iterable. To stemize a large file without keeping it in memory, pass the
+    result of :func:`iter_stems` on the file object as ``stems`` and a short
+    string (e.g., the file name) as data.
+    """
+
+    @lazy
+    def bow_boolean(self):
+        return bag_of_words(self.stems, 'boolean')
+
+    @lazy
+    def bow_frequency(self):
+        return bag_of_words(self.stems, 'frequency')
+
+    @lazy
+    def bow_count(self):
+        return bag_of_words(self.stems, 'count')
+
+    @property
+    def bow_weighted(self):
+        # Recomputed on access if the weights changed since the last call
+        weights = self.weights
+        if weights is None:
+            raise AttributeError('must define .weights attribute before')
+        version = getattr(weights, 'version', None)
+        cached = self.__dict__.get('_bow_weighted')
+        if cached is None or cached[0] is not weights or cached[1] != version:
+            bow = bag_of_words(self.stems, 'weighted', weights=weights)
+            cached = self._bow_weighted = (weights, version, bow)
+        return cached[2]
+
+    @property
+    def bow(self):
+        return self.bag_of_words(self.method)
+
+    def __init__(self, data, method=None, stop_words=None,
+                 ngrams=1, weights=None, stems=None):
+        _check_data(data)
+        super().__init__(data)
+        if stems is None:
+            stems = stemize(data, stop_words=stop_words, ngrams=ngrams)
+        self.stems = list(stems)
+        self.weights = weights
+        self.method = method
+
+    def __repr__(self):
+        data = self.data
+        if len(data) >= 10:
+            data = data[:10] + '...'
+        return '%s(%r)' % (type(self).__name__, data)
+
+    def __str__(self):
+        return self.data
+
+    def words(self):
+        """
+        Return a sorted list of unique words or stems present in text.
+        """
+
+        return sorted(set(self.stems))
+
+    def bag_of_words(self, method=None):
+        """
+        Return a Counter object from computing a bag of words using the given
+        method.
+
+        Args:
+            method (str):
+                Same meaning as the ``method`` attribute in the :func:`bag_of_words`
+                function.
+        """
+
+        if method is None:
+            if self.method is None:
+                raise RuntimeError('must define the default method')
+            return self.bow
+
+        if method == 'weighted' and self.weights is None:
+            raise RuntimeError('must define the .weights attribute first')
+        try:
+            return getattr(self, 'bow_' + method)
+        except AttributeError:
+            raise ValueError('invalid method: %r' % method)
+
+
+class _Weights(dict):
+    """
+    Internal: weights shared by the texts of an NLPJob. The version is
+    incremented whenever they change.
+    """
+
+    version = 0
+
+
+class NLPJob:
+    """
+    Represent a natural language processing job.
+
+    Parameters:
+        texts: list of text strings
+        dedup: if given, a Jaccard similarity threshold (see
+            :class:`tenhodito_nlp.dedup.NearDuplicates`). Texts that are near
+            duplicates of a text already in the job are not added to it.
+    """
+
+    @property
+    def method(self):
+        return self._method
+
+    @method.setter
+    def method(self, value):
+        self._update_method(value)
+
+    def __init__(self, texts=(), method='weighted', stop_words=None, ngrams=1,
+                 n_jobs=1, chunksize=64, dedup=None):
+        self._stop_words = stop_words
+        self._ngrams = ngrams
+        self._n_jobs = n_jobs
+        self._chunksize = chunksize
+        self._weights = _Weights()
+        self._dedup = None
+        self._duplicates = []
+        if dedup:
+            from tenhodito_nlp.dedup import NearDuplicates, THRESHOLD
+
+            threshold = THRESHOLD if dedup is True else dedup
+            self._dedup = NearDuplicates(threshold, stop_words=stop_words)
+        self._texts = self._make_texts(texts)
+        self._method = method
+        self._vocabulary = None
+        self._matrices = {}
+        self._document_frequency = Counter()
+        for text in self._texts:
+            self._document_frequency.update(text.bow_boolean)
+        self._update_method(method)
+        self._update_weights()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __iter__(self):
+        for text in self._texts:
+            yield text.data
+
+    def __getitem__(self, idx):
+        return self._texts[idx].data
+
+    def _make_text(self, data):
+        """
+        Create a Text instance for the given string using the job's options.
+        """
+
+        text = Text(data, stop_words=self._stop_words, ngrams=self._ngrams)
+        text.weights = self._weights
+        return text
+
+    def _make_texts(self, texts):
+        """
+        Create a list of Text instances from an iterable of strings.
+
+        If the job was created with n_jobs != 1, stemming and counting are
+        performed in a process pool.
+        """
+
+        if self._n_jobs == 1:
+            return self._drop_duplicates(map(self._make_text, texts))
+
+        # Chunks are sent to the pool in order and imap() return results in
+        # the same order, so we keep the sent strings in a queue.
+        pending = deque()
+
+        def tasks():
+            chunk = []
+            for data in texts:
+                _check_data(data)
+                chunk.append(str(data))
+                if len(chunk) == self._chunksize:
+                    pending.append(chunk)
+                    yield chunk, self._stop_words, self._ngrams
+                    chunk = []
+            if chunk:
+                pending.append(chunk)
+                yield chunk, self._stop_words, self._ngrams
+
+        n_jobs = self._n_jobs if self._n_jobs and self._n_jobs > 0 else None
+        result = []
+        with multiprocessing.Pool(n_jobs) as pool, \
+                profiling.stage('stemming'):
+            for words, counts in pool.imap(_count_stems, tasks()):
+                chunk = pending.popleft()
+                for data, (ids, unique, count) in zip(chunk, counts):
+                    stems = [words[i] for i in ids]
+                    text = Text(data, weights=self._weights, stems=stems)
+                    text.bow_count = Counter(
+                        {words[i]: int(n) for (i, n) in zip(unique, count)})
+                    text.bow_boolean = Counter(
+                        dict.fromkeys(text.bow_count, 1))
+                    result.append(text)
+        return self._drop_duplicates(result)
+
+    def _drop_duplicates(self, texts):
+        """
+        Return a list with the texts that are not near duplicates of a text in
+        the job or of a previous text in the list, if dedup is enabled.
+        """
+
+        if self._dedup is None:
+            return list(texts)
+
+        result = []
+        for text in texts:
+            data = text.stems if self._ngrams == 1 else text.data
+            original = self._dedup.add(text, data)
+            if original is None:
+                result.append(text)
+            else:
+                self._duplicates.append((text.data, original.data))
+        return result
+
+    def duplicates(self):
+        """
+        Return a list of (text, original) pairs with the texts that were not
+        added to the job because they are near duplicates of an original
+        text.
+        """
+
+        return list(self._duplicates)
+
+    @classmethod
+    def from_corpus(cls, corpus, method='weighted', dedup=None):
+        """
+        Create a new job from the documents of a
+        :class:`tenhodito_nlp.corpus.Corpus`.
+
+        Documents are not stemmed again and the job uses the corpus'
+        stemming options. The corpus only stores stems, so the text of each
+        document is its stems joined by spaces.
+
+        Use the corpus directly where a job is expected (e.g., in
+        :func:`kmeans`) if texts do not need to be added or removed: it does
+        not load the documents in memory.
+        """
+
+        job = cls(method=method, stop_words=corpus._stop_words,
+                  ngrams=corpus._ngrams, dedup=dedup)
+        texts = (Text(' '.join(stems), weights=job._weights, stems=stems)
+                 for stems in corpus)
+        job._texts = job._drop_duplicates(texts)
+        for text in job._texts:
+            job._document_frequency.update(text.bow_boolean)
+        job._update_method(method)
+        job._update_weights()
+        return job
+
+    @classmethod
+    def from_iterable(cls, iterable, method='weighted', stop_words=None,
+                      ngrams=1, n_jobs=None, chunksize=64, dedup=None):
+        """
+        Create a new job from an iterable of text strings.
+
+        Texts are consumed in chunks of the given size and stemmed in a
+        process pool. The resulting job is identical to the one created in
+        serial mode.
+
+        Args:
+            iterable:
+                Any iterable of strings (e.g., a generator that reads texts
+                from disk).
+            n_jobs (int):
+                Number of worker processes. None or a non-positive value uses
+                all available cores and 1 disables the process pool.
+            chunksize (int):
+                Number of texts sent to a worker at once.
+
+        Other arguments are the same as in NLPJob.
+        """
+
+        return cls(iterable, method=method, stop_words=stop_words,
+                   ngrams=ngrams, n_jobs=n_jobs, chunksize=chunksize,
+                   dedup=dedup)
+
+    def words(self):
+        """
+        Return a list of words from all texts.
+        """
+
+        return sorted(self._document_frequency)
+
+    def vocabulary(self):
+        """
+        Return a dictionary mapping each stem to its column index in the
+        document-term matrix. Columns are ordered as the list returned by
+        self.words().
+        """
+
+        if self._vocabulary is None:
+            words = self.words()
+            self._vocabulary = {stem: i for (i, stem) in enumerate(words)}
+        return self._vocabulary
+
+    def common_words(self, n=None, by_document=False):
+        """
+        Return a list of (word, frequency) pairs for the the n-th most common
+        words.
+        """
+
+        counter = Counter()
+        if by_document:
+            N = len(self._texts)
+            for text in self._texts:
+                counter += text.bow_boolean
+            common = counter.most_common(n)
+            return [(word, n / N) for (word, n) in common]
+        else:
+            for text in self._texts:
+                counter += text.bow_count
+            total = sum(counter.values())
+            common = counter.most_common(n)
+            return [(word, count / total) for (word, count) in common]
+
+    def document_frequency(self):
+        """
+        Return a Counter mapping counting the number of texts in which each word
+        appears.
+        """
+
+        return Counter(self._document_frequency)
+
+    def weights(self):
+        """
+        Compute weights for each word based on the logarithm of the total number
+        of documents over the document frequency.
+        """
+
+        return dict(self._weights)
+
+    @profiling.instrumented('weights')
+    def _update_weights(self):
+        """
+        Update the weights factor for all texts in the NPLJob.
+
+        All texts share the same weights dictionary, which is updated in place
+        and has its version incremented. Texts recompute their weighted bag of
+        words on the next access, so no text is visited here.
+        """
+
+        N = len(self._texts)
+        frequencies = self._document_frequency
+        weights = {stem: log(N / freq) for (stem, freq) in frequencies.items()}
+        if weights != self._weights:
+            self._weights.clear()
+            self._weights.update(weights)
+            self._weights.version += 1
+            self._matrices.pop('weighted', None)
+
+    def add_texts(self, texts):
+        """
+        Add new texts to the job.
+
+        Document frequencies, weights and cached matrices are updated in place,
+        and only the new texts are stemmed.
+
+        Args:
+            texts:
+                A sequence of text strings.
+        """
+
+        new_texts = self._make_texts(texts)
+        if not new_texts:
+            return
+        for text in new_texts:
+            text.method = self._method
+            self._document_frequency.update(text.bow_boolean)
+        self._texts.extend(new_texts)
+
+        # The weighted matrix is rebuilt from the frequency matrix on use
+        self._matrices.pop('weighted', None)
+        self._update_vocabulary()
+        for method, matrix in list(self._matrices.items()):
+            rows = self._rows_matrix(new_texts, method)
+            matrix = sparse.vstack([matrix, rows], format='csr')
+            self._matrices[method] = matrix
+        self._update_weights()
+
+    def remove_texts(self, indexes):
+        """
+        Remove the texts in the given positions from the job.
+
+        Document frequencies, weights and cached matrices are updated in place.
+
+        Args:
+            indexes:
+                A sequence of integer indexes for the texts that should be
+                removed.
+        """
+
+        N = len(self._texts)
+        indexes = {range(N)[i] for i in indexes}
+        if not indexes:
+            return
+        frequencies = self._document_frequency
+        for i in indexes:
+            for stem in self._texts[i].bow_boolean:
+                frequencies[stem] -= 1
+                if frequencies[stem] == 0:
+                    del frequencies[stem]
+        if self._dedup is not None:
+            for i in indexes:
+                self._dedup.remove(self._texts[i])
+        keep = np.array([i not in indexes for i in range(N)], dtype=bool)
+        self._texts = [text for (i, text) in enumerate(self._texts)
+                       if i not in indexes]
+
+        self._matrices.pop('weighted', None)
+        for method, matrix in list(self._matrices.items()):
+            self._matrices[method] = matrix[keep]
+        self._update_vocabulary()
+        self._update_weights()
+
+    def _update_vocabulary(self):
+        """
+        Update the vocabulary after the document frequencies have changed.
+
+        Columns of the cached matrices are remapped to the new vocabulary.
+        """
+
+        old = self._vocabulary
+        if old is None:
+            return
+        self._vocabulary = None
+        vocabulary = self.vocabulary()
+        if vocabulary.keys() == old.keys():
+            self._vocabulary = old
+            return
+
+        # Maps each old column to its new position or -1 if it was removed.
+        remap = np.full(len(old), -1, dtype=np.int64)
+        for stem, i in old.items():
+            remap[i] = vocabulary.get(stem, -1)
+        keep = remap >= 0
+
+        for method, matrix in list(self._matrices.items()):
+            if not keep.all():
+                matrix = matrix[:, np.flatnonzero(keep)]
+            columns = remap[keep][matrix.indices]
+            shape = (matrix.shape[0], len(vocabulary))
+            matrix = sparse.csr_matrix((matrix.data, columns, matrix.indptr),
+                                       shape=shape)
+            self._matrices[method] = matrix
+
+    def _update_method(self, method):
+        """
+        Update default method.
+        """
+
+        for text in self._texts:
+            text.method = method
+        self._method = method
+
+    def vector(self, i):
+        """
+        Return the i-th document as a :class:`numpy.array`. Each component
+        corresponds to the value in the counter object. Components are ordered
+        as the list returned by self.words()
+        """
+
+        return self.sparse_matrix()[i].toarray().ravel()
+
+    def sparse_matrix(self, method=None):
+        """
+        Return the document-term matrix as a :class:`scipy.sparse.csr_matrix`.
+
+        The matrix is computed only once for each method and is cached for
+        later calls.
+
+        Args:
+            method (str):
+                Same meaning as the ``method`` attribute in the
+                :func:`bag_of_words` function. Defaults to the job's method.
+        """
+
+        if method is None:
+            method = self._method
+        try:
+            matrix = self._matrices[method]
+        except KeyError:
+            profiling.count('matrix', hit=False)
+        else:
+            profiling.count('matrix', hit=True)
+            return matrix
+
+        with profiling.stage('matrix'):
+            return self._build_matrix(method)
+
+    def _build_matrix(self, method):
+        """
+        Compute and cache the document-term matrix for the given method.
+        """
+
+        # Weighted values are the relative frequencies scaled by the weights of
+        # each column. This avoids recomputing every text when weights change.
+        if method == 'weighted':
+            weights = self._weights
+            scale = np.array([weights.get(w, 1) for w in self.words()])
+            matrix = self.sparse_matrix('frequency').multiply(scale[None, :])
+            matrix = sparse.csr_matrix(matrix)
+        else:
+            matrix = self._rows_matrix(self._texts, method)
+        self._matrices[method] = matrix
+        return matrix
+
+    def _rows_matrix(self, texts, method):
+        """
+        Return a CSR matrix with the bag of words of the given texts, using
+        the job's vocabulary.
+        """
+
+        vocabulary = self.vocabulary()
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            bow = text.bag_of_words(method)
+            indices.extend(vocabulary[stem] for stem in bow)
+            data.extend(bow.values())
+            indptr.append(len(indices))
+
+        shape = (len(texts), len(vocabulary))
+        matrix = sparse.csr_matrix((np.array(data, dtype=float),
+                                    np.array(indices, dtype=np.int32),
+                                    np.array(indptr, dtype=np.int64)),
+                                   shape=shape)
+        matrix.sort_indices()
+        return matrix
+
+    def matrix(self, dense=False):
+        """
+        Convert documents to a matrix.
+
+        Args:
+            dense (bool):
+                If True, return a dense :class:`numpy.array`. The default is to
+                return the sparse matrix from :meth:`sparse_matrix`.
+        """
+
+        matrix = self.sparse_matrix()
+        if dense:
+            return matrix.toarray()
+        return matrix
+
+    def _cos_angle(self, i, j):
+        """
+        Same as cos(self.angle(i, j))
+        """
+
+        u = self.vector(i)
+        v = self.vector(j)
+        return cos_angle(u, v)
+
+    def angle(self, i, j):
+        """
+        Angle between vectors created from the i-th and j-th texts in Euclidean
+        space (in radians).
+        """
+
+        return np.arccos(self._cos_angle(i, j))
+
+    def similarity(self, i, j, method='triangular'):
+        """
+        Return a normalized measure of similarity between the i-th and j-th
+        texts. The resulting value is between 0 (no similarity) and 1
+        (identity).
+
+        Args:
+            i, j (int):
+                Index for the respective text.
+            method:
+                One of 'angle',
+        """
+
+        return similarity(self.vector(i), self.vector(j), method=method)
+
+    def similarity_matrix(self, method='triangular', block_size=512):
+        """
+        Return the similarity matrix for all pairs of i, j.
+
+        Args:
+            method:
+                Same as in :meth:`similarity`.
+            block_size (int):
+                Number of rows computed at once. Larger blocks are faster, but
+                use more memory.
+        """
+
+        return similarity_matrix(self.sparse_matrix(), method, block_size)
+
+
+def _as_job(job):
+    """
+    Internal function: return job if it has a document-term matrix (an
+    NLPJob or a Corpus) or a new NLPJob for a list of texts.
+    """
+
+    if hasattr(job, 'sparse_matrix'):
+        return job
+    return NLPJob(job)
+
+
+def _count_stems(args):
+    """
+    Internal function executed by the process pool in NLPJob.
+
+    Stemize a chunk of texts and return a (words, counts) tuple. Words is the
+    list of stems found in the chunk and counts has an (ids, unique, count)
+    tuple of arrays for each text: ids are the positions of each stem in
+    words, and unique/count are the distinct ids in order of first occurrence
+    and the number of times they appear in the text.
+    """
+
+    texts, stop_words, ngrams = args
+    index = {}
+    counts = []
+    for text in texts:
+        stems = stemize(text, stop_words=stop_words, ngrams=ngrams)
+        ids = np.array([index.setdefault(stem, len(index)) for stem in stems],
+                       dtype=np.int32)
+        unique, first, count = np.unique(ids, return_index=True,
+                                         return_counts=True)
+        order = np.argsort(first)
+        counts.append((ids, unique[order], count[order]))
+    return list(index), counts
+
+
+@profiling.instrumented('kmeans')
+def kmeans(job, k, whiten=True, batch_size=None, tol=1e-4, max_iter=100,
+           seed=None):
+    """
+    Performs a k-means classification for all documents in the given job.
+
+    Args:
+        job (list, NPLJob or Corpus):
+            A list of texts, a natural language processing job (NPLJob)
+            instance or a :class:`tenhodito_nlp.corpus.Corpus`.
+        k (int):
+            The desired number of clusters.
+        whiten (bool):
+            If True, columns are scaled by their standard deviation.
+        batch_size (int):
+            If given, uses mini-batch k-means on the sparse document-term
+            matrix (see :func:`minibatch_kmeans`) instead of the full k-means
+            on the dense matrix.
+        tol, max_iter:
+            Convergence tolerance and maximum number of iterations of the
+            mini-batch k-means.
+        seed (int):
+            Seed for the random initialization.
+
+    Return:
+        centroids:
+            A 2D array with all found centroids.
+        labels:
+            A sequence in witch the i-th element correspond to the cluster index
+            for the i-th document.
+    """
+
+    job = _as_job(job)
+
+    if batch_size is not None:
+        return minibatch_kmeans(job.sparse_matrix(), k, whiten=whiten,
+                                batch_size=batch_size, tol=tol,
+                                max_iter=max_iter, seed=seed)
+
+    data = job.matrix(dense=True)
+    std = 1
+    if whiten:
+        std = data.std(axis=0)
+        std[std == 0] = 1
+        data /= std[None, :]
+    from scipy.cluster.vq import kmeans2
+
+    centroids, labels = kmeans2(data, k, minit='points', seed=seed)
+    centroids *= std
+    return centroids, labels
+
+
+def sparse_std(matrix):
+    """
+    Return the standard deviation of each column of a sparse matrix.
+    """
+
+    mean = np.asarray(matrix.mean(axis=0)).ravel()
+    square = np.asarray(matrix.multiply(matrix).mean(axis=0)).ravel()
+    return np.sqrt(np.maximum(square - mean * mean, 0))
+
+
+def _row_norms(rows):
+    """
+    Internal function: return the squared euclidean norms of the rows of a
+    dense or sparse matrix.
+    """
+
+    if sparse.issparse(rows):
+        return np.asarray(rows.multiply(rows).sum(axis=1)).ravel()
+    return (rows * rows).sum(axis=1)
+
+
+def _squared_distances(rows, centroids, centroids_norm):
+    """
+    Internal function: return the squared euclidean distances between the
+    rows of a dense or sparse matrix and each centroid.
+    """
+
+    products = rows.dot(centroids.T)
+    if sparse.issparse(products):
+        products = products.toarray()
+    products = np.asarray(products)
+    return _row_norms(rows)[:, None] - 2 * products + centroids_norm[None, :]
+
+
+class MiniBatchKMeans:
+    """
+    Incremental mini-batch k-means.
+
+    Batches of rows are given one at a time to :meth:`partial_fit`, so the
+    rows never need to be in memory at the same time (e.g., batches of rows
+    read from a file or from a :class:`tenhodito_nlp.corpus.Corpus`).
+    Each batch is assigned to the nearest centroids, which move towards the
+    mean of their rows with a learning rate that decreases with the number
+    of rows already assigned to them.
+
+    Columns are not whitened: scale the batches beforehand if necessary.
+
+    Args:
+        k (int):
+            The desired number of clusters.
+        centroids:
+            Optional k x n_columns array with the initial centroids. By
+            default, k random rows of the first batch are used.
+        seed (int):
+            Seed used to choose the initial centroids.
+
+    Attributes:
+        centroids:
+            The current centroids as a k x n_columns array.
+        shift (float):
+            Squared shift of the centroids in the last call to
+            :meth:`partial_fit`.
+    """
+
+    def __init__(self, k, centroids=None, seed=None):
+        self.k = k
+        if centroids is not None:
+            centroids = np.array(centroids, dtype=float)
+        self.centroids = centroids
+        self.counts = np.zeros(k)
+        self.shift = np.inf
+        self._rng = np.random.RandomState(seed)
+
+    def partial_fit(self, rows):
+        """
+        Update the centroids with a batch of rows, given as a dense array or
+        a scipy.sparse matrix.
+        """
+
+        rows = sparse.csr_matrix(rows, dtype=float)
+        if self.centroids is None:
+            if rows.shape[0] < self.k:
+                raise ValueError('the first batch must have at least k rows')
+            idx = self._rng.choice(rows.shape[0], self.k, replace=False)
+            self.centroids = rows[idx].toarray()
+
+        centroids = self.centroids
+        labels = self.predict(rows)
+        old = centroids.copy()
+        for j in np.unique(labels):
+            members = rows[labels == j]
+            n = members.shape[0]
+            self.counts[j] += n
+            total = np.asarray(members.sum(axis=0)).ravel()
+            centroids[j] += (total - n * centroids[j]) / self.counts[j]
+        self.shift = ((centroids - old) ** 2).sum()
+        return self
+
+    def predict(self, rows):
+        """
+        Return the index of the nearest centroid of each row in a batch.
+        """
+
+        if self.centroids is None:
+            raise RuntimeError('partial_fit() must be called first')
+        norms = (self.centroids * self.centroids).sum(axis=1)
+        distances = _squared_distances(rows, self.centroids, norms)
+        return distances.argmin(axis=1)
+
+
+@profiling.instrumented('kmeans')
+def minibatch_kmeans(matrix, k, whiten=True, batch_size=256, tol=1e-4,
+                     max_iter=100, seed=None):
+    """
+    Mini-batch k-means for a sparse matrix.
+
+    Each iteration gives a random batch of rows to
+    :meth:`MiniBatchKMeans.partial_fit`. Rows are never converted to a dense
+    array, so memory usage depends on batch_size and on the size of the
+    centroids, but not on the number of rows. Use :class:`MiniBatchKMeans`
+    directly for rows that do not fit in memory.
+
+    Args:
+        matrix:
+            A scipy.sparse matrix with one row per document.
+        k (int):
+            The desired number of clusters.
+        whiten (bool):
+            If True, columns are scaled by their standard deviation, computed
+            from sparse column statistics.
+        batch_size (int):
+            Number of rows in each batch.
+        tol (float):
+            Stop when the squared shift of the centroids in an iteration is
+            below tol times the mean variance of the columns.
+        max_iter (int):
+            Maximum number of iterations.
+        seed (int):
+            Seed for the initial centroids and the batches.
+
+    Return:
+        A (centroids, labels) tuple as in :func:`kmeans`.
+    """
+
+    matrix = sparse.csr_matrix(matrix, dtype=float)
+    n_rows = matrix.shape[0]
+    if k > n_rows:
+        raise ValueError('k must not exceed the number of rows')
+    rng = np.random.RandomState(seed)
+
+    std = sparse_std(matrix)
+    variance = np.mean(std * std)
+    scale = np.ones_like(std)
+    if whiten:
+        scale[std > 0] = std[std > 0]
+        matrix = matrix.dot(sparse.diags(1 / scale)).tocsr()
+        variance = np.mean(std > 0)
+    threshold = tol * variance
+
+    centroids = matrix[rng.choice(n_rows, k, replace=False)].toarray()
+    model = MiniBatchKMeans(k, centroids)
+    batch_size = min(batch_size, n_rows)
+    for _ in range(max_iter):
+        model.partial_fit(matrix[rng.choice(n_rows, batch_size,
+                                            replace=False)])
+        if model.shift <= threshold:
+            break
+
+    labels = np.empty(n_rows, dtype=int)
+    for start in range(0, n_rows, batch_size):
+        rows = matrix[start:start + batch_size]
+        labels[start:start + batch_size] = model.predict(rows)
+    return model.centroids * scale, labels
+
+
+KMeansResult = namedtuple('KMeansResult',
+                          'k centroids labels inertia silhouette')
+
+# Data shared with the k-means worker processes. With the fork start method
+# workers inherit it from the parent without copying.
+_shared = {}
+
+
+def _init_shared(data):
+    if data is not None:
+        _shared['data'] = data
+
+
+def _kmeans_task(args):
+    """
+    Internal function executed by the process pool in :func:`kmeans_sweep`.
+
+    Run k-means once over the shared data and return a (k, seed, inertia,
+    centroids, labels) tuple.
+    """
+
+    k, seed, batch_size, tol, max_iter = args
+    data = _shared['data']
+    if batch_size is None:
+        from scipy.cluster.vq import kmeans2
+
+        centroids, labels = kmeans2(data, k, minit='points', seed=seed)
+    else:
+        centroids, labels = minibatch_kmeans(data, k, whiten=False,
+                                             batch_size=batch_size, tol=tol,
+                                             max_iter=max_iter, seed=seed)
+    norms = (centroids * centroids).sum(axis=1)
+    distances = _squared_distances(data, centroids, norms)
+    inertia = distances[np.arange(len(labels)), labels].sum()
+    return k, seed, max(float(inertia), 0.0), centroids, labels
+
+
+def _silhouette_task(labels):
+    """
+    Internal function executed by the process pool in :func:`kmeans_sweep`.
+    """
+
+    return silhouette_score(_shared['data'], labels)
+
+
+def silhouette_score(data, labels, block_size=512):
+    """
+    Return the mean silhouette coefficient of a clustering of the rows of a
+    dense or sparse matrix using euclidean distances.
+
+    Distances are computed in blocks of rows, so memory usage is proportional
+    to block_size times the number of rows. Return NaN if there is a single
+    cluster or each row is in its own cluster.
+    """
+
+    clusters, labels = np.unique(np.asarray(labels), return_inverse=True)
+    n_rows = len(labels)
+    if not 1 < len(clusters) < n_rows:
+        return float('nan')
+
+    sizes = np.bincount(labels)
+    members = sparse.csr_matrix(
+        (np.ones(n_rows), (labels, np.arange(n_rows))),
+        shape=(len(clusters), n_rows))
+    norms = _row_norms(data)
+    scores = np.empty(n_rows)
+    for start in range(0, n_rows, block_size):
+        rows = data[start:start + block_size]
+        idx = np.arange(rows.shape[0])
+        distances = _squared_distances(rows, data, norms)
+        distances = np.sqrt(np.maximum(distances, 0))
+        distances[idx, start + idx] = 0
+
+        # Sum of the distances from each row to the rows of each cluster
+        sums = np.asarray(members.dot(distances.T)).T
+        own = labels[start:start + block_size]
+        a = sums[idx, own] / np.maximum(sizes[own] - 1, 1)
+        means = sums / sizes[None, :]
+        means[idx, own] = np.inf
+        b = means.min(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block = (b - a) / np.maximum(a, b)
+        block[(sizes[own] == 1) | ~np.isfinite(block)] = 0
+        scores[start:start + len(own)] = block
+    return float(scores.mean())
+
+
+@profiling.instrumented('kmeans')
+def kmeans_sweep(job, ks, n_init=10, whiten=True, batch_size=None, tol=1e-4,
+                 max_iter=100, seed=0, n_jobs=None, silhouette=True):
+    """
+    Run k-means for several numbers of clusters and random restarts in a
+    process pool and keep the best solution for each k.
+
+    The (whitened) document-term matrix is computed once and shared by the
+    worker processes. Each k runs n_init times with seeds seed, seed + 1,
+    ..., and the solution with the smallest inertia is kept.
+
+    Args:
+        job (list, NPLJob or Corpus):
+            A list of texts, a natural language processing job or a
+            :class:`tenhodito_nlp.corpus.Corpus`.
+        ks:
+            An integer or a sequence with the numbers of clusters.
+        n_init (int):
+            Number of restarts for each k.
+        n_jobs (int):
+            Number of worker processes. None or a non-positive value uses
+            all available cores and 1 disables the process pool.
+        silhouette (bool):
+            If False, the silhouette coefficient, which is quadratic in the
+            number of documents, is not computed.
+
+    Other arguments are the same as in :func:`kmeans`.
+
+    Return:
+        A dictionary mapping each k to a KMeansResult(k, centroids, labels,
+        inertia, silhouette) named tuple. Inertia (the sum of squared
+        distances to the closest centroid) and silhouette are computed in the
+        whitened space. Model selection can be made, e.g., by choosing the k
+        with the largest silhouette.
+    """
+
+    job = _as_job(job)
+    ks = [ks] if isinstance(ks, int) else list(ks)
+
+    if batch_size is None:
+        data = job.matrix(dense=True)
+        scale = data.std(axis=0) if whiten else np.ones(data.shape[1])
+        scale[scale == 0] = 1
+        data /= scale[None, :]
+    else:
+        data = job.sparse_matrix().astype(float)
+        scale = sparse_std(data) if whiten else np.ones(data.shape[1])
+        scale[scale == 0] = 1
+        data = data.dot(sparse.diags(1 / scale)).tocsr()
+
+    tasks = [(k, seed + i, batch_size, tol, max_iter)
+             for k in ks for i in range(n_init)]
+    best = {}
+    n_jobs = n_jobs if n_jobs and n_jobs > 0 else None
+    _shared['data'] = data
+    pool = None
+    try:
+        if n_jobs == 1:
+            results = map(_kmeans_task, tasks)
+        else:
+            fork = multiprocessing.get_start_method() == 'fork'
+            initargs = (None if fork else data,)
+            pool = multiprocessing.Pool(n_jobs, _init_shared, initargs)
+            results = pool.imap_unordered(_kmeans_task, tasks)
+
+        # Ties are broken by seed, since results arrive in any order
+        for k, task_seed, inertia, centroids, labels in results:
+            if k not in best or (inertia, task_seed) < best[k][:2]:
+                best[k] = (inertia, task_seed, centroids, labels)
+
+        scores = {k: float('nan') for k in ks}
+        if silhouette:
+            labels = [best[k][3] for k in ks]
+            if pool is None:
+                values = map(_silhouette_task, labels)
+            else:
+                values = pool.map(_silhouette_task, labels)
+            scores = dict(zip(ks, values))
+    finally:
+        _shared.clear()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return {k: KMeansResult(k, best[k][2] * scale, best[k][3], best[k][0],
+                            scores[k])
+            for k in ks}
@@ -0,0 +1,287 @@
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Report that receives the measurements. Instrumentation is disabled when it
+# is None and instrumented functions only pay for this check.
+_active = None
+_local = threading.local()
+_caches = {}
+
+
+class StageStats:
+    """
+    Measurements of a single stage.
+
+    Attributes:
+        name (str):
+            Stage name.
+        calls (int):
+            Number of times the stage was executed.
+        time (float):
+            Total wall time in seconds, including nested stages.
+        hits, misses (int):
+            Number of cache hits and misses recorded for the stage.
+        peak (int):
+            Largest increase in traced memory during a single execution of
+            the stage, in bytes. Zero if memory is not traced.
+    """
+
+    __slots__ = ('name', 'calls', 'time', 'hits', 'misses', 'peak')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.peak = 0
+
+    def __repr__(self):
+        return '<%s %s: %s calls, %.3f s>' % (type(self).__name__, self.name,
+                                              self.calls, self.time)
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of cache lookups that were hits or None if the stage has no
+        cache lookups.
+        """
+
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def as_dict(self):
+        return {'name': self.name, 'calls': self.calls, 'time': self.time,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate, 'peak': self.peak}
+
+
+class ProfileReport:
+    """
+    Measurements of all stages executed while profiling was enabled.
+
+    Stages are accessed by name (e.g., ``report['stemming'].time``) and
+    iterated in the order they were first executed.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.wall_time = 0.0
+        self._lock = threading.Lock()
+        self._start = None
+        self._cache_info = {}
+
+    def __getitem__(self, name):
+        return self.stages[name]
+
+    def __contains__(self, name):
+        return name in self.stages
+
+    def __iter__(self):
+        return iter(list(self.stages.values()))
+
+    def __str__(self):
+        return self.format()
+
+    def stage(self, name):
+        """
+        Return the :class:`StageStats` for the given stage, creating it if
+        necessary.
+        """
+
+        with self._lock:
+            try:
+                return self.stages[name]
+            except KeyError:
+                stats = self.stages[name] = StageStats(name)
+                return stats
+
+    def record(self, name, elapsed=None, peak=0, hits=0, misses=0):
+        """
+        Add measurements to the given stage. A call is counted if elapsed is
+        not None.
+        """
+
+        stats = self.stage(name)
+        with self._lock:
+            if elapsed is not None:
+                stats.calls += 1
+                stats.time += elapsed
+            stats.peak = max(stats.peak, peak)
+            stats.hits += hits
+            stats.misses += misses
+
+    def as_dict(self):
+        """
+        Return the report as a JSON serializable dictionary.
+        """
+
+        return {'wall_time': self.wall_time,
+                'stages': [stats.as_dict() for stats in self]}
+
+    def format(self):
+        """
+        Return the report as a table.
+        """
+
+        lines = ['%-16s %8s %10s %8s %12s'
+                 % ('stage', 'calls', 'time (s)', 'hits', 'peak (KiB)')]
+        for stats in self:
+            rate = stats.hit_rate
+            rate = '-' if rate is None else '%.1f%%' % (100 * rate)
+            lines.append('%-16s %8d %10.3f %8s %12.1f'
+                         % (stats.name, stats.calls, stats.time, rate,
+                            stats.peak / 1024))
+        lines.append('total wall time: %.3f s' % self.wall_time)
+        return '\n'.join(lines)
+
+
+def register_cache(stage, cache_info):
+    """
+    Register a function with the same interface as ``functools.lru_cache``'s
+    cache_info(). Hits and misses of the cache while profiling is enabled are
+    added to the given stage.
+    """
+
+    _caches[stage] = cache_info
+
+
+def enable(trace_memory=True):
+    """
+    Start recording measurements in a new :class:`ProfileReport` and return
+    it.
+
+    If trace_memory is True, tracemalloc is started (if necessary) to record
+    the peak memory of each stage. This makes all allocations slower.
+    """
+
+    global _active
+    report = ProfileReport(trace_memory)
+    report._cache_info = {stage: info() for (stage, info) in _caches.items()}
+    report._started_tracemalloc = False
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        report._started_tracemalloc = True
+    report._start = time.perf_counter()
+    _active = report
+    return report
+
+
+def disable():
+    """
+    Stop recording measurements and return the current report.
+    """
+
+    global _active
+    report, _active = _active, None
+    if report is None:
+        return None
+    report.wall_time += time.perf_counter() - report._start
+    for stage, old in report._cache_info.items():
+        # Counters may have been reset while profiling
+        new = _caches[stage]()
+        report.record(stage, hits=max(new.hits - old.hits, 0),
+                      misses=max(new.misses - old.misses, 0))
+    if report._started_tracemalloc:
+        tracemalloc.stop()
+    return report
+
+
+def is_enabled():
+    return _active is not None
+
+
+@contextmanager
+def profile(trace_memory=True):
+    """
+    Context manager that records measurements of all stages executed in the
+    block::
+
+        with profile() as report:
+            job = NLPJob(texts)
+        print(report)
+    """
+
+    report = enable(trace_memory)
+    try:
+        yield report
+    finally:
+        disable()
+
+
+def _update_peaks(stack):
+    peak = tracemalloc.get_traced_memory()[1]
+    for entry in stack:
+        entry[1] = max(entry[1], peak)
+
+
+@contextmanager
+def stage(name):
+    """
+    Context manager that measures the execution of the block as the given
+    stage. Does nothing if profiling is disabled.
+
+    Nested executions of the same stage (e.g., a function that calls
+    another one with the same stage) are measured only once.
+    """
+
+    report = _active
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    if report is None or any(entry[0] == name for entry in stack):
+        yield
+        return
+
+    # Each entry holds the stage name, the largest traced memory seen during
+    # its execution and the traced memory at its start. The peak is reset in
+    # each stage, so it is propagated to enclosing stages first.
+    tracing = report.trace_memory and tracemalloc.is_tracing()
+    entry = [name, 0, 0]
+    if tracing:
+        _update_peaks(stack)
+        tracemalloc.reset_peak()
+        entry[1] = entry[2] = tracemalloc.get_traced_memory()[0]
+    stack.append(entry)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if tracing:
+            _update_peaks(stack)
+            peak = entry[1] - entry[2]
+        stack.pop()
+        report.record(name, elapsed, peak)
+
+
+def count(name, hit, n=1):
+    """
+    Record n cache hits or misses for the given stage if profiling is
+    enabled.
+    """
+
+    report = _active
+    if report is not None:
+        report.record(name, hits=n if hit else 0, misses=0 if hit else n)
+
+
+def instrumented(name):
+    """
+    Decorator that measures each call of a function as the given stage.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
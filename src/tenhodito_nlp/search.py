@@ -0,0 +1,103 @@
+import numpy as np
+from scipy import sparse
+
+from tenhodito_nlp.stemming import bag_of_words, stemize
+
+
+class SimilarityIndex:
+    """
+    Inverted index for top-k cosine similarity queries over the documents of
+    an :class:`tenhodito_nlp.nlp.NLPJob`.
+
+    Queries are stemized with the job's options and weighted with the job's
+    IDF weights. Each stem points to a postings list with the documents in
+    which it appears and their weighted values, so a query only scores
+    documents that share at least one stem with it.
+
+    The index reflects the job at the time it was created.
+
+    Args:
+        job (NLPJob or Corpus):
+            The indexed job or a :class:`tenhodito_nlp.corpus.Corpus`.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._weights = job.weights()
+        self._vocabulary = job.vocabulary()
+        matrix = job.sparse_matrix('weighted')
+        self._norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))
+                              .ravel())
+
+        # Row i of the transposed matrix is the postings list of stem i
+        self._postings = sparse.csr_matrix(matrix.T)
+
+    def __len__(self):
+        return len(self._norms)
+
+    def _query_matrix(self, texts):
+        """
+        Return the matrix of weighted queries and their norms.
+
+        Norms consider all stems in each query, even those that are not in
+        the vocabulary of the job.
+        """
+
+        vocabulary = self._vocabulary
+        indptr = [0]
+        indices = []
+        data = []
+        norms = []
+        for text in texts:
+            stems = stemize(text, stop_words=self.job._stop_words,
+                            ngrams=self.job._ngrams)
+            bow = bag_of_words(stems, 'weighted', weights=self._weights)
+            norms.append(np.sqrt(sum(x * x for x in bow.values())))
+            for stem, value in bow.items():
+                if stem in vocabulary:
+                    indices.append(vocabulary[stem])
+                    data.append(value)
+            indptr.append(len(indices))
+
+        shape = (len(texts), len(vocabulary))
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=shape,
+                                   dtype=float)
+        return matrix, np.array(norms)
+
+    def query(self, text, k=10):
+        """
+        Return a list of (index, cosine) pairs for the k documents most similar
+        to the given text, in decreasing order of similarity.
+
+        Documents that share no stem with the text are never returned.
+        """
+
+        return self.query_many([text], k)[0]
+
+    def query_many(self, texts, k=10):
+        """
+        Batched version of :meth:`query`. Return a list of results for each
+        text.
+        """
+
+        texts = list(texts)
+        queries, query_norms = self._query_matrix(texts)
+        scores = queries.dot(self._postings).tocsr()
+        scores.eliminate_zeros()
+
+        results = []
+        for i in range(len(texts)):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            docs = scores.indices[start:end]
+            values = scores.data[start:end]
+            if not len(docs):
+                results.append([])
+                continue
+
+            values = values / (self._norms[docs] * query_norms[i])
+            if len(docs) > k:
+                top = np.argpartition(-values, k - 1)[:k]
+                docs, values = docs[top], values[top]
+            order = np.lexsort((docs, -values))
+            results.append([(int(docs[j]), float(values[j])) for j in order])
+        return results
@@ -0,0 +1,252 @@
+"""
+Stemming and bags of words.
+
+This module only depends on PyStemmer and stop_words, which are loaded on
+first use, so it can be imported quickly (e.g., by command line tools).
+"""
+
+import functools
+import re
+from collections import Counter, deque
+
+from tenhodito_nlp import profiling
+
+STEM_CACHE_SIZE = 2 ** 16
+TOKEN_REGEX = re.compile(r'\S+')
+
+
+@functools.lru_cache(maxsize=None)
+def _stemmer():
+    from Stemmer import Stemmer
+
+    return Stemmer('portuguese')
+
+
+@functools.lru_cache(maxsize=None)
+def default_stop_words():
+    """
+    Return the list of Portuguese stop words. The list is read from disk on
+    the first call.
+    """
+
+    import stop_words
+
+    return stop_words.get_stop_words('portuguese')
+
+
+def __getattr__(name):
+    # Compatibility with the old module level constants
+    if name == 'stemmer':
+        return _stemmer()
+    elif name == 'DEFAULT_STOP_WORDS':
+        return default_stop_words()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def strip_punctuation(word):
+    """
+    Remove punctuation from the end of word.
+    """
+
+    return word.rstrip('.,:;?!)]}-%#/\\')
+
+
+@functools.lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    """
+    Return the stem of a single word.
+
+    Results are kept in a bounded LRU cache, since the vocabulary of
+    parliamentary speech is very skewed. Use :func:`stem_cache_info` to
+    inspect the hit/miss counters.
+    """
+
+    return _stemmer().stemWord(word)
+
+
+@functools.lru_cache(maxsize=32)
+def _stop_stems(stop_words):
+    return frozenset(map(stem, stop_words))
+
+
+def stop_stems(stop_words=None):
+    """
+    Return a frozenset with the stems of all stop words.
+
+    The result is computed only once for each list of stop words.
+    """
+
+    if stop_words is None:
+        stop_words = default_stop_words()
+    return _stop_stems(tuple(stop_words))
+
+
+def stem_cache_info():
+    """
+    Return a named tuple with the hits, misses, maxsize and currsize of the
+    stem cache.
+    """
+
+    return stem.cache_info()
+
+
+def clear_stem_cache():
+    """
+    Clear all cached stems and reset the hit/miss counters.
+    """
+
+    stem.cache_clear()
+    _stop_stems.cache_clear()
+
+
+profiling.register_cache('stemming', stem_cache_info)
+
+
+@profiling.instrumented('stemming')
+def stemize(text, stop_words=None, ngrams=1):
+    """
+    Receive a string of text and return a list of stems.
+
+    Args:
+        text (str):
+            A string of text to stemize. It can also be a file-like object,
+            which is read using :func:`iter_stems`.
+        stop_words (list):
+            List of stop words.
+        ngrams (int):
+            If given, uses n-grams instead of words.
+    """
+
+    if not isinstance(text, str):
+        return list(iter_stems(text, stop_words=stop_words, ngrams=ngrams))
+
+    excluded = stop_stems(stop_words)
+    words = text.casefold().split()
+    words = map(stem, map(strip_punctuation, words))
+    data = [w for w in words if w and w not in excluded]
+    if ngrams == 1:
+        return data
+    else:
+        result = []
+        for i in range(len(data) - ngrams + 1):
+            words = data[i:i + ngrams]
+            result.append(' '.join(words))
+        return result
+
+
+def iter_words(source, bufsize=2 ** 16):
+    """
+    Iterate over the whitespace separated words of a string or a file-like
+    object opened in text mode.
+
+    File-like objects are read in blocks of bufsize characters, so memory
+    usage does not depend on the size of the file.
+    """
+
+    if isinstance(source, str):
+        for match in TOKEN_REGEX.finditer(source):
+            yield match.group()
+        return
+
+    tail = ''
+    while True:
+        chunk = source.read(bufsize)
+        if not chunk:
+            break
+        words = (tail + chunk).split()
+        tail = '' if chunk[-1].isspace() else words.pop()
+        yield from words
+    if tail:
+        yield tail
+
+
+def iter_stems(source, stop_words=None, ngrams=1, bufsize=2 ** 16):
+    """
+    Lazy version of :func:`stemize`.
+
+    Return an iterator over the stems (or n-grams) of a string or a
+    file-like object. Only the current n-gram window is kept in memory.
+
+    Args:
+        source:
+            A string or a file-like object opened in text mode.
+        stop_words, ngrams:
+            Same as in :func:`stemize`.
+        bufsize (int):
+            Number of characters read at once from file-like objects.
+    """
+
+    excluded = stop_stems(stop_words)
+    words = iter_words(source, bufsize)
+    stems = (stem(strip_punctuation(word.casefold())) for word in words)
+    stems = (w for w in stems if w and w not in excluded)
+    if ngrams == 1:
+        return stems
+    return _iter_ngrams(stems, ngrams)
+
+
+def _iter_ngrams(stems, n):
+    """
+    Internal function: join each sliding window of n stems.
+    """
+
+    window = deque(maxlen=n)
+    for item in stems:
+        window.append(item)
+        if len(window) == n:
+            yield ' '.join(window)
+
+
+def _force_stemize(data):
+    """
+    Internal function: return an iterator over stems. Data can be a list of
+    stems, a string or a file-like object.
+    """
+
+    if isinstance(data, str) or hasattr(data, 'read'):
+        return iter_stems(data)
+    else:
+        return iter(data)
+
+
+@profiling.instrumented('bag_of_words')
+def bag_of_words(data, method='boolean', weights=None):
+    """
+    Convert a text to a Counter object.
+
+    Args:
+        data:
+            Can be a string of text, a file-like object or an iterable of
+            stems. Strings and files are consumed lazily using the
+            :func:`iter_stems` function.
+        method:
+            Weighting factor used in as the values of the Counter object.
+
+            'boolean' (default):
+                Existing words receive a value of 1.
+            'frequency':
+                Weight corresponds to the relative frequency of each words
+            'count':
+                Weight corresponds to the number of times the word appears on
+                text.
+            'weighted':
+                Inverse frequency weighting method.
+        weights:
+            ??
+    """
+
+    count = Counter(_force_stemize(data))
+
+    if method == 'boolean':
+        return Counter({stem: 1 for stem in count})
+    elif method == 'frequency':
+        total = sum(count.values())
+        return Counter({stem: n / total for (stem, n) in count.items()})
+    elif method == 'count':
+        return count
+    elif method == 'weighted':
+        total = sum(count.values())
+        return Counter({stem: weights.get(stem, 1) * (n / total)
+                        for (stem, n) in count.items()})
+    else:
+        raise ValueError('invalid method: %r' % method)
@@ -0,0 +1,65 @@
+"""
+Helpers for reading and writing JSON Lines files one record at a time.
+
+The filename '-' stands for the standard input or output, so commands can
+be chained with pipes.
+"""
+
+import json
+import sys
+from contextlib import contextmanager
+
+
+@contextmanager
+def open_input(filename):
+    """
+    Open a text file for reading in UTF-8. The filename '-' is the standard
+    input.
+    """
+    if filename != '-':
+        with open(filename, encoding='utf-8') as infile:
+            yield infile
+    else:
+        yield sys.stdin
+
+
+@contextmanager
+def open_output(filename):
+    """
+    Open a text file for writing in UTF-8. The filename '-' is the standard
+    output.
+    """
+    if filename != '-':
+        with open(filename, 'w', encoding='utf-8') as outfile:
+            yield outfile
+    else:
+        yield sys.stdout
+        sys.stdout.flush()
+
+
+def is_jsonl(filename):
+    """
+    Return True if records should be streamed to or from filename.
+    """
+    return filename == '-' or filename.endswith('.jsonl')
+
+
+def read_jsonl(filename):
+    """
+    Iterate over the records of a JSON Lines file, reading one line at a
+    time.
+    """
+    with open_input(filename) as infile:
+        for line in infile:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_jsonl(records, filename):
+    """
+    Write each record to a JSON Lines file as soon as it is produced.
+    """
+    with open_output(filename) as outfile:
+        for record in records:
+            outfile.write(json.dumps(record, ensure_ascii=False))
+            outfile.write('\n')
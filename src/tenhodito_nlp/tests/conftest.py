@@ -0,0 +1,19 @@
+import pytest
+
+from tenhodito_nlp.nlp import NLPJob
+
+
+@pytest.fixture
+def texts():
+    return [
+        'O deputado defendeu a reforma da previdência social.',
+        'A reforma tributária foi votada pelo plenário.',
+        'Saúde e educação são prioridades do governo federal.',
+        'O plenário aprovou a reforma da educação.',
+        'Discurso sem palavras novas: reforma, reforma, reforma.',
+    ]
+
+
+@pytest.fixture
+def job(texts):
+    return NLPJob(texts)
@@ -0,0 +1,68 @@
+import pickle
+import shelve
+
+import pytest
+
+from tenhodito_nlp.cache import BlobList, BlobStore, SQLiteCache, open_cache
+
+
+@pytest.fixture(params=['sqlite', 'shelve'])
+def cache(request, tmpdir):
+    path = str(tmpdir.join('cache'))
+    cache = open_cache(path, request.param, batch_size=2, index_dates=True)
+    yield cache
+    cache.close()
+
+
+def test_cache_get_and_set(cache):
+    cache['1/2/2016'] = [('Fulano', 'discurso')]
+    assert cache['1/2/2016'] == [('Fulano', 'discurso')]
+    assert '1/2/2016' in cache
+    assert '2/2/2016' not in cache
+    with pytest.raises(KeyError):
+        cache['2/2/2016']
+
+
+def test_cache_range_is_chronological(cache):
+    with cache.batch():
+        for date in ['3/1/2016', '10/12/2015', '1/2/2016', '15/1/2016']:
+            cache[date] = date
+    keys = [key for (key, _) in cache.range('1/1/2016', '31/1/2016')]
+    assert keys == ['3/1/2016', '15/1/2016']
+
+
+def test_sqlite_cache_migrates_shelve_and_pickles(tmpdir):
+    path = str(tmpdir.join('speeches'))
+    with shelve.open(path + '.db') as db:
+        db['1/2/2016'] = ['old']
+    cache = open_cache(path, 'sqlite')
+    assert isinstance(cache, SQLiteCache)
+    assert cache['1/2/2016'] == ['old']
+
+    cache['2/2/2016'] = ['new']
+    clone = pickle.loads(pickle.dumps(cache))
+    assert clone['2/2/2016'] == ['new']
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'zstd'])
+def test_blob_store_deduplicates_and_compresses(codec):
+    if codec == 'zstd':
+        pytest.importorskip('zstandard')
+    store = BlobStore(codec=codec)
+    text = 'Sr. Presidente, Srs. Deputados, ' * 100
+    ref = store.put(text)
+    assert store.put(text) == ref
+    assert store.put(ref) is ref
+    assert store[ref] == text
+    assert len(store) == 1
+    assert store.size() < len(text)
+    assert list(BlobList(store, [ref, ref])) == [text, text]
+
+
+def test_blob_store_put_does_not_load_stored_texts(monkeypatch):
+    store = BlobStore(batch_size=1)
+    ref = store.put('Sr. Presidente')
+    monkeypatch.setattr(store, '_loads', None)
+    assert ref in store
+    assert store.put('Sr. Presidente') == ref
+    assert 'missing' not in store
@@ -0,0 +1,71 @@
+import logging
+import random
+
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from tenhodito_nlp import coherence
+
+TOPICS = ['reforma da previdência', 'saúde', 'educação', 'segurança',
+          'reforma tributária', 'impostos', 'meio ambiente', 'transporte',
+          'agricultura', 'habitação', 'emprego', 'cultura']
+KEYWORDS = ['%s %d' % (topic, i) for topic in TOPICS for i in range(10)]
+
+
+@pytest.fixture
+def congressmen():
+    rng = random.Random(0)
+    result = {}
+    for i in range(50):
+        result['DEPUTADO %d' % i] = {
+            'proposals': rng.choices(KEYWORDS, k=rng.randint(0, 60)),
+            'speeches': rng.choices(KEYWORDS, k=rng.randint(0, 60)),
+        }
+    result['SEM PALAVRAS'] = {'proposals': [], 'speeches': []}
+    return result
+
+
+def per_congressman_coherence(congressmen):
+    """
+    The original algorithm, with a vectorizer for each congressman.
+    """
+    for cm in congressmen:
+        texts = coherence.raw_texts(congressmen[cm])
+        bags = {'proposals': {}, 'speeches': {}}
+        vectorizer = CountVectorizer(tokenizer=coherence.tokenizer)
+        try:
+            vector = vectorizer.fit_transform(texts).toarray()
+            for word, i in vectorizer.vocabulary_.items():
+                if vector[coherence.PROPOSALS][i] > 0:
+                    bags['proposals'][word] = vector[coherence.PROPOSALS][i]
+                if vector[coherence.SPEECHES][i] > 0:
+                    bags['speeches'][word] = vector[coherence.SPEECHES][i]
+            congressmen[cm]['coherence'] = cosine_similarity(vector)[0][1]
+        except ValueError as e:
+            logging.warning(e)
+        congressmen[cm].update(bags)
+    return congressmen
+
+
+def test_coherence_is_identical_to_per_congressman_vectorizers(congressmen):
+    expected = per_congressman_coherence(
+        {cm: dict(data) for (cm, data) in congressmen.items()})
+    result = coherence.coherence(congressmen)
+    assert result == expected
+    assert 'coherence' not in result['SEM PALAVRAS']
+
+
+def test_jsonl_streaming_matches_batch_coherence(congressmen, tmpdir,
+                                                 monkeypatch):
+    monkeypatch.chdir(tmpdir)  # main() writes its log to the current dir
+    input = str(tmpdir.join('data.jsonl'))
+    output = str(tmpdir.join('final.jsonl'))
+    coherence.write_jsonl(congressmen.items(), input)
+    coherence.main(input, output)
+
+    expected = coherence.coherence(
+        {cm: dict(data) for (cm, data) in congressmen.items()})
+    records = list(coherence.read_jsonl(output))
+    assert [cm for (cm, _) in records] == list(congressmen)
+    assert dict(records) == expected
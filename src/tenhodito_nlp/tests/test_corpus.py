@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from tenhodito_nlp.corpus import Corpus
+from tenhodito_nlp.nlp import NLPJob, kmeans_sweep
+from tenhodito_nlp.search import SimilarityIndex
+from tenhodito_nlp.stemming import stemize
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('corpus'))
+
+
+def test_corpus_matrices_are_equal_to_nlpjob(texts, path):
+    corpus = Corpus.from_texts(path, texts)
+    job = NLPJob(texts)
+    assert len(corpus) == len(texts)
+    assert [corpus[i] for i in range(len(texts))] == list(map(stemize, texts))
+    assert corpus.words() == job.words()
+    assert corpus.document_frequency() == job.document_frequency()
+    assert corpus.weights() == pytest.approx(job.weights())
+    for method in ['boolean', 'frequency', 'count', 'weighted']:
+        expected = job.sparse_matrix(method).toarray()
+        result = corpus.sparse_matrix(method).toarray()
+        assert result == pytest.approx(expected)
+
+
+def test_corpus_append_does_not_rewrite_data(texts, path):
+    Corpus.from_texts(path, texts[:3])
+    with open(path + '/stems.u32', 'rb') as fd:
+        stems = fd.read()
+
+    corpus = Corpus(path, 'a')
+    corpus.add_texts(texts[3:])
+    with open(path + '/stems.u32', 'rb') as fd:
+        assert fd.read().startswith(stems)
+
+    reader = Corpus(path)
+    assert list(reader) == list(map(stemize, texts))
+    assert reader[-1] == stemize(texts[-1])
+    with pytest.raises(ValueError):
+        reader.append([['reform']])
+
+
+def test_corpus_ignores_interrupted_append(texts, path):
+    Corpus.from_texts(path, texts[:2])
+    with open(path + '/stems.u32', 'ab') as fd:
+        fd.write(b'\xff' * 6)
+    with open(path + '/vocabulary.txt', 'a') as fd:
+        fd.write('partial')
+
+    corpus = Corpus(path, 'a')
+    assert list(corpus) == list(map(stemize, texts[:2]))
+    corpus.add_texts(texts[2:])
+    assert list(Corpus(path)) == list(map(stemize, texts))
+    assert 'partial' not in corpus.stems()
+
+
+def test_corpus_ignores_vocabulary_of_interrupted_append(texts, path):
+    Corpus.from_texts(path, texts[:2])
+    with open(path + '/vocabulary.txt', 'a') as fd:
+        fd.write('orfao\n')
+
+    corpus = Corpus(path, 'a')
+    job = NLPJob(texts[:2])
+    assert 'orfao' not in corpus.stems()
+    assert corpus.words() == job.words()
+    assert corpus.weights() == pytest.approx(job.weights())
+    SimilarityIndex(corpus)
+
+    corpus.append([['orfao', 'reform']])
+    assert Corpus(path)[-1] == ['orfao', 'reform']
+    assert Corpus(path).stems().count('orfao') == 1
+
+
+def test_corpus_ignores_stems_of_failed_append(texts, path):
+    corpus = Corpus.from_texts(path, texts[:2])
+
+    def failing():
+        yield 'Saúde e educação.'
+        raise OSError('read error')
+
+    with pytest.raises(OSError):
+        corpus.add_texts(failing())
+    corpus.add_texts(['reforma tributária'])
+    for corpus in [corpus, Corpus(path)]:
+        assert 'saud' not in corpus.stems()
+        assert corpus.weights() == pytest.approx(NLPJob(
+            texts[:2] + ['reforma tributária']).weights())
+
+
+def test_corpus_refresh_sees_appended_documents(texts, path):
+    writer = Corpus.from_texts(path, texts[:2])
+    reader = Corpus(path)
+    writer.add_texts(texts[2:])
+    assert len(reader) == 2
+    reader.refresh()
+    assert len(reader) == len(texts)
+
+
+def test_corpus_can_be_used_as_job(texts, path):
+    corpus = Corpus.from_texts(path, texts)
+    job = NLPJob(texts)
+
+    result = kmeans_sweep(corpus, [2, 3], n_init=2, n_jobs=1)
+    expected = kmeans_sweep(job, [2, 3], n_init=2, n_jobs=1)
+    for k in [2, 3]:
+        assert np.array_equal(result[k].labels, expected[k].labels)
+
+    query = 'reforma da educação'
+    result = SimilarityIndex(corpus).query(query)
+    expected = SimilarityIndex(job).query(query)
+    assert [i for (i, _) in result] == [i for (i, _) in expected]
+    assert ([x for (_, x) in result]
+            == pytest.approx([x for (_, x) in expected]))
+
+    loaded = NLPJob.from_corpus(corpus)
+    assert loaded.words() == job.words()
+    assert (loaded.sparse_matrix().toarray()
+            == pytest.approx(job.sparse_matrix().toarray()))
+
+
+def test_missing_corpus(path):
+    with pytest.raises(FileNotFoundError):
+        Corpus(path)
@@ -0,0 +1,172 @@
+import os
+
+import pytest
+
+from tenhodito_nlp import crawler, streams
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def sample(name):
+    """
+    Return the saved sample response of an endpoint.
+    """
+
+    with open(os.path.join(DATA_DIR, name + '.xml'), 'rb') as fd:
+        return fd.read()
+
+
+def test_session_pool_follows_max_workers(monkeypatch):
+    monkeypatch.setattr(crawler, 'session', None)
+    monkeypatch.setattr(crawler, '_session_pool_size', 0)
+    monkeypatch.setattr(crawler, 'get_cm_dict', dict)
+    list(crawler.iter_crawl('01/01/2016', '31/01/2016', max_workers=32))
+    adapter = crawler.get_session().get_adapter(crawler.CAMARA_BASE_URL)
+    assert adapter._pool_maxsize == 32
+
+
+def fake_api_get(sent):
+    """
+    Return a fake api_get() for a single deputy that records the requests
+    in sent as (endpoint, argument) pairs.
+    """
+
+    def api_get(endpoint, params=None):
+        name = endpoint.rsplit('/', 1)[-1]
+        params = params or {}
+        if name == 'ObterDeputados':
+            sent.append((name, None))
+            return (b'<deputados><deputado>'
+                    b'<nomeParlamentar>FULANO</nomeParlamentar>'
+                    b'<nome>Fulano de Tal</nome><uf>DF</uf>'
+                    b'<partido>PT</partido></deputado></deputados>')
+        elif name == 'ListarProposicoes':
+            start = params['datApresentacaoIni']
+            sent.append((name, start))
+            return ('<proposicoes><proposicao><id>%s</id></proposicao>'
+                    '</proposicoes>' % start[3:5]).encode('utf-8')
+        elif name == 'ObterProposicaoPorID':
+            sent.append((name, params['idProp']))
+            return ('<proposicao><Indexacao>indexacao %s</Indexacao>'
+                    '</proposicao>' % params['idProp']).encode('utf-8')
+        elif name == 'ListarDiscursosPlenario':
+            sent.append((name, params['dataIni']))
+            return ('<sessoesDiscursos><sessao><discursos><discurso>'
+                    '<txtIndexacao>discurso %s</txtIndexacao></discurso>'
+                    '</discursos></sessao></sessoesDiscursos>'
+                    % params['dataIni']).encode('utf-8')
+        raise ValueError(endpoint)
+
+    return api_get
+
+
+def test_date_windows_are_aligned_with_months():
+    assert crawler.date_windows('15/12/2015', '10/02/2016') == [
+        ('15/12/2015', '31/12/2015'),
+        ('01/01/2016', '31/01/2016'),
+        ('01/02/2016', '10/02/2016'),
+    ]
+    assert crawler.date_windows('02/03/2016', '01/03/2016') == []
+
+
+def test_checkpoint_stores_units(tmpdir):
+    path = str(tmpdir.join('checkpoint'))
+    key = crawler.unit_key(crawler.API_GET_SPEECHES, 'FULANO', 'início')
+    checkpoint = crawler.Checkpoint(path, sync_every=1)
+    assert key not in checkpoint
+    checkpoint[key] = ['discurso']
+    checkpoint.close()
+
+    checkpoint = crawler.Checkpoint(path)
+    assert key == 'ListarDiscursosPlenario::FULANO::início'
+    assert checkpoint[key] == ['discurso']
+    checkpoint.close()
+
+
+def test_crawl_with_checkpoint_fetches_only_missing_units(tmpdir,
+                                                          monkeypatch):
+    sent = []
+    monkeypatch.setattr(crawler, 'api_get', fake_api_get(sent))
+    path = str(tmpdir.join('checkpoint'))
+    checkpoint = crawler.Checkpoint(path)
+    try:
+        crawler.crawl('01/01/2016', '29/02/2016', checkpoint=checkpoint)
+    finally:
+        checkpoint.close()
+    assert len(sent) == 7
+
+    # A resumed crawl over an overlapping range only sends the requests of
+    # the new month
+    del sent[:]
+    checkpoint = crawler.Checkpoint(path)
+    try:
+        congressmen = crawler.crawl('01/02/2016', '31/03/2016',
+                                    checkpoint=checkpoint)
+    finally:
+        checkpoint.close()
+    assert sorted(sent) == [
+        ('ListarDiscursosPlenario', '01/03/2016'),
+        ('ListarProposicoes', '01/03/2016'),
+        ('ObterDeputados', None),
+        ('ObterProposicaoPorID', '03'),
+    ]
+    cm = congressmen['FULANO']
+    assert cm['name'] == 'Fulano de Tal'
+    assert cm['proposals'] == ['indexacao 02', 'indexacao 03']
+    assert cm['speeches'] == ['discurso 01/02/2016', 'discurso 01/03/2016']
+
+
+def test_parsers_match_untangle_traversal(monkeypatch):
+    untangle = pytest.importorskip('untangle')
+    monkeypatch.setattr(crawler, 'api_get', lambda endpoint, params=None:
+                        sample(endpoint.rsplit('/', 1)[-1]))
+
+    def parse(name):
+        return untangle.parse(sample(name).decode('utf-8'))
+
+    obj = parse('ObterDeputados')
+    congressmen = crawler.get_cm_dict()
+    assert congressmen == {
+        cm.nomeParlamentar.cdata: {
+            'name': cm.nome.cdata, 'photo': cm.urlFoto.cdata,
+            'state': cm.uf.cdata, 'party': cm.partido.cdata,
+            'phone': cm.fone.cdata, 'email': cm.email.cdata,
+            'proposals': [], 'speeches': []}
+        for cm in obj.deputados.deputado}
+    assert len(congressmen) == 2
+
+    cm = 'JOSÉ SILVA'
+    obj = parse('ListarProposicoes')
+    ids = crawler.get_cm_proposal_ids(congressmen, cm, '01/01/2016',
+                                      '31/12/2016')
+    assert ids == [prop.id.cdata for prop in obj.proposicoes.proposicao]
+    assert ids == ['2076459', '2080012']
+
+    obj = parse('ObterProposicaoPorID')
+    indexation = crawler.get_proposal_indexation(ids[0])
+    assert indexation == obj.proposicao.Indexacao.cdata
+
+    obj = parse('ListarDiscursosPlenario')
+    speeches = crawler.get_cm_speeches(congressmen, cm, '01/01/2016',
+                                       '31/12/2016')
+    assert speeches == [speech.txtIndexacao.cdata
+                        for session in obj.sessoesDiscursos.sessao
+                        for phase in session.fasesSessao.faseSessao
+                        for speech in phase.discursos.discurso]
+    assert len(speeches) == 4
+
+
+def test_iter_crawl_to_jsonl_matches_crawl(tmpdir, monkeypatch):
+    monkeypatch.setattr(crawler, 'api_get', lambda endpoint, params=None:
+                        sample(endpoint.rsplit('/', 1)[-1]))
+    expected = crawler.crawl('01/01/2016', '31/12/2016')
+    path = str(tmpdir.join('data.jsonl'))
+    records = crawler.iter_crawl('01/01/2016', '31/12/2016', batch_size=1)
+    crawler.to_jsonl(records, path)
+
+    result = {}
+    for record in streams.read_jsonl(path):
+        result[record.pop('congressman')] = record
+    assert result == expected
+    assert list(result) == list(expected)
+    assert len(result['JOSÉ SILVA']['speeches']) == 4
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from tenhodito_nlp.dedup import (MinHash, NearDuplicates, jaccard,
+                                 near_duplicates, shingles)
+from tenhodito_nlp.miner import DeputyTexts
+from tenhodito_nlp.nlp import NLPJob
+
+SPEECH = ('Senhor presidente, senhoras e senhores deputados, venho a esta '
+          'tribuna para registrar a importância da reforma da previdência '
+          'social para o equilíbrio das contas públicas e para garantir o '
+          'pagamento das aposentadorias das futuras gerações de brasileiros '
+          'que contribuem todos os meses com o seu trabalho.')
+
+
+@pytest.fixture
+def speeches():
+    # The third speech is a near duplicate of the first one
+    return [
+        SPEECH,
+        'A comissão de educação aprovou o projeto que amplia o ensino '
+        'integral nas escolas públicas de todos os municípios do país.',
+        SPEECH.replace('brasileiros', 'cidadãos'),
+        'O plenário votou hoje a medida provisória sobre o salário mínimo.',
+    ]
+
+
+def test_minhash_estimates_jaccard():
+    a = shingles(SPEECH)
+    b = shingles(SPEECH.replace('brasileiros', 'cidadãos'))
+    exact = len(a & b) / len(a | b)
+    minhash = MinHash(num_perm=256)
+    estimate = jaccard(minhash.signature(a), minhash.signature(b))
+    assert abs(estimate - exact) < 0.1
+    assert np.array_equal(minhash.signature(a), MinHash(256).signature(a))
+
+
+def test_near_duplicates(speeches):
+    result = near_duplicates(speeches, threshold=0.7)
+    assert [(i, j) for (i, j, _) in result] == [(0, 2)]
+
+
+def test_job_dedup_mode(speeches):
+    job = NLPJob(speeches, dedup=0.7)
+    assert list(job) == [speeches[0], speeches[1], speeches[3]]
+    assert job.duplicates() == [(speeches[2], speeches[0])]
+    assert job.weights() == NLPJob(list(job)).weights()
+
+    job.remove_texts([0])
+    job.add_texts([speeches[2]])
+    assert list(job) == [speeches[1], speeches[3], speeches[2]]
+
+
+def test_deputy_texts_dedup_mode(speeches):
+    deputy = DeputyTexts('Fulano', dedup=NearDuplicates(0.7))
+    deputy.add_discourses(speeches)
+    assert list(deputy.discourses) == [speeches[0], speeches[1], speeches[3]]
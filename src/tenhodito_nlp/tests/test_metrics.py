@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from tenhodito_nlp.metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles():
+    hist = Histogram([1, 2, 4])
+    for value in [0.5, 0.5, 1.5, 3, 10]:
+        hist.observe(value)
+    assert hist.counts == [2, 3, 4]
+    assert hist.count == 5
+    assert hist.quantile(0.4) == 1
+    assert hist.quantile(0.5) == pytest.approx(1.5)
+    assert hist.quantile(0.99) == 4
+
+
+def test_render_prometheus_text_format():
+    metrics = Metrics(buckets=[0.1, 1])
+    metrics.observe('ObterDeputados', 0.05)
+    metrics.observe('ObterDeputados', 0.5, error=True)
+    metrics.cache('ListarProposicoes', hit=True, n=3)
+    metrics.cache('ListarProposicoes', hit=False)
+    with pytest.raises(ValueError):
+        with metrics.time('ListarProposicoes'):
+            raise ValueError
+    text = metrics.render()
+    lines = text.splitlines()
+
+    prefix = 'tenhodito_crawler_'
+    assert prefix + 'requests_total{endpoint="ObterDeputados"} 2' in lines
+    assert (prefix + 'request_errors_total{endpoint="ObterDeputados"} 1'
+            in lines)
+    assert (prefix + 'request_errors_total{endpoint="ListarProposicoes"} 1'
+            in lines)
+    assert prefix + 'cache_hits_total{endpoint="ListarProposicoes"} 3' in lines
+    assert (prefix + 'request_duration_seconds_bucket'
+            '{endpoint="ObterDeputados",le="0.1"} 1' in lines)
+    assert (prefix + 'request_duration_seconds_bucket'
+            '{endpoint="ObterDeputados",le="+Inf"} 2' in lines)
+    assert '# TYPE %srequest_duration_seconds histogram' % prefix in lines
+    assert text.endswith('\n')
+
+    summary = metrics.summary()
+    assert 'ObterDeputados' in summary
+    assert '75.0%' in summary
+
+
+def test_metrics_are_written_periodically(tmpdir):
+    path = str(tmpdir.join('crawl.prom'))
+    with Metrics(path, interval=0.01) as metrics:
+        metrics.observe('ObterDeputados', 0.2)
+        time.sleep(0.1)
+        with open(path) as fd:
+            assert 'endpoint="ObterDeputados"} 1' in fd.read()
+        metrics.observe('ObterDeputados', 0.2)
+    with open(path) as fd:
+        assert 'endpoint="ObterDeputados"} 2' in fd.read()
+    assert not tmpdir.join('crawl.prom.tmp').exists()
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from tenhodito_nlp import miner
+
+
+class FakeSessions:
+    """
+    Fake Câmara API that records the largest number of concurrent requests.
+    """
+
+    def __init__(self):
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def request(self, result):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return result
+
+    def speeches(self, start, end):
+        speeches = [{'numeroInsercao': i, 'numeroQuarto': 1,
+                     'orador': {'nome': 'Fulano', 'numero': 1}}
+                    for i in range(4)]
+        return self.request([{'codigo': start, 'fasesSessao': {
+            'faseSessao': {'discursos': {'discurso': speeches}}}}])
+
+    def full_speech(self, *args):
+        return self.request({'discurso': 'discurso %s' % (args,)})
+
+
+def test_read_interval_bounds_concurrent_requests(tmpdir, monkeypatch):
+    sessions = FakeSessions()
+    camara = type('Camara', (), {'sessions': sessions})
+    monkeypatch.setattr(miner, '_camara', lambda: camara)
+    miner.set_cache_dir(str(tmpdir))
+    try:
+        discourses = miner.DiscourseMiner(max_workers=3)
+        discourses.read_interval('1/8/2016', '8/8/2016')
+    finally:
+        miner.set_cache_dir('.')
+    assert sessions.peak <= 3
+    deputy, = discourses.deputies()
+    assert len(deputy.discourses) == 32
+
+
+def test_cache_backend_is_used_by_all_caches(tmpdir, monkeypatch):
+    camara = type('Camara', (), {'sessions': FakeSessions()})
+    monkeypatch.setattr(miner, '_camara', lambda: camara)
+    miner.set_cache_dir(str(tmpdir))
+    try:
+        discourses = miner.DiscourseMiner(cache_backend='shelve')
+        discourses.read_interval('1/8/2016', '2/8/2016')
+        discourses.sync()
+    finally:
+        miner.set_cache_dir('.')
+    files = tmpdir.listdir(lambda path: path.basename.startswith(
+        ('full-speech', 'speeches_by_date')))
+    assert files
+    assert not [path for path in files if path.ext == '.sqlite']
@@ -0,0 +1,236 @@
+import io
+
+import numpy as np
+import pytest
+import scipy.sparse
+
+from tenhodito_nlp import miner, nlp, stemming
+from tenhodito_nlp.nlp import NLPJob
+from tenhodito_nlp.search import SimilarityIndex
+from tenhodito_nlp.stemming import bag_of_words, iter_stems, stemize
+
+
+@pytest.mark.parametrize('method', ['boolean', 'frequency', 'count',
+                                    'weighted'])
+def test_sparse_matrix_matches_bag_of_words(job, texts, method):
+    matrix = job.sparse_matrix(method)
+    words = job.words()
+    assert matrix.shape == (len(texts), len(words))
+    for i, text in enumerate(texts):
+        bow = bag_of_words(text, method, weights=job.weights())
+        expected = np.array([bow.get(w, 0.0) for w in words])
+        assert np.allclose(matrix[i].toarray().ravel(), expected)
+
+
+def test_matrix_is_sparse_unless_dense_is_requested(job):
+    assert not isinstance(job.matrix(), np.ndarray)
+    dense = job.matrix(dense=True)
+    assert isinstance(dense, np.ndarray)
+    assert np.allclose(dense[1], job.vector(1))
+
+
+@pytest.mark.parametrize('method', ['angle', 'triangular'])
+def test_similarity_matrix_matches_pairwise_similarity(job, method):
+    N = len(job)
+    expected = np.ones([N, N])
+    for i in range(N):
+        for j in range(N):
+            if i != j:
+                expected[i, j] = job.similarity(i, j, method)
+    assert np.allclose(job.similarity_matrix(method, block_size=3), expected)
+
+
+def test_add_and_remove_texts_match_a_fresh_job(texts):
+    job = NLPJob(texts[:2])
+    for method in ['boolean', 'count', 'weighted']:
+        job.sparse_matrix(method)
+    job._texts[1].bow_weighted
+    job.add_texts(texts[2:])
+    job.remove_texts([0])
+    fresh = NLPJob(texts[1:])
+    assert job.words() == fresh.words()
+    assert job.weights() == fresh.weights()
+    assert job.document_frequency() == fresh.document_frequency()
+    for method in ['boolean', 'count', 'weighted']:
+        assert np.allclose(job.sparse_matrix(method).toarray(),
+                           fresh.sparse_matrix(method).toarray())
+    text = job._texts[0]
+    assert text.bag_of_words('weighted') == fresh._texts[0].bow_weighted
+
+
+def test_weighted_matrix_follows_texts_with_unchanged_weights():
+    job = NLPJob(['o a de'])
+    assert job.sparse_matrix().shape == (1, 0)
+    job.add_texts(['de o'])
+    assert job.sparse_matrix().shape == (2, 0)
+    job.remove_texts([0])
+    assert job.sparse_matrix().shape == (1, 0)
+
+
+def test_weighted_bags_of_words_follow_weight_updates(texts):
+    job = NLPJob(texts[:2])
+    text = job._texts[0]
+    before = text.bow
+    job.add_texts(texts[2:])
+    assert text.bow != before
+    assert text.bow == NLPJob(texts)._texts[0].bow
+    text.weights = {}
+    assert text.bow == text.bow_frequency
+
+
+def test_stemize_uses_stem_cache():
+    stemming.clear_stem_cache()
+    text = 'reforma reformas reforma da previdência'
+    assert stemize(text) == ['reform', 'reform', 'reform', 'prevident']
+    info = stemming.stem_cache_info()
+    stemize(text)
+    assert stemming.stem_cache_info().misses == info.misses
+    assert stemming.stem_cache_info().hits == info.hits + 5
+
+
+def test_parallel_job_is_identical_to_serial_job(texts):
+    serial = NLPJob(texts)
+    parallel = NLPJob.from_iterable(iter(texts), n_jobs=2, chunksize=3)
+    assert list(parallel) == list(serial)
+    assert parallel.words() == serial.words()
+    assert parallel.common_words() == serial.common_words()
+    assert parallel.weights() == serial.weights()
+    assert np.array_equal(parallel.matrix(dense=True),
+                          serial.matrix(dense=True))
+
+
+@pytest.mark.parametrize('ngrams', [1, 2, 3])
+def test_iter_stems_reads_files_lazily(texts, ngrams):
+    data = '\n'.join(texts)
+    stems = iter_stems(io.StringIO(data), ngrams=ngrams, bufsize=7)
+    assert not isinstance(stems, list)
+    assert list(stems) == stemize(data, ngrams=ngrams)
+    bow = bag_of_words(io.StringIO(data), 'count')
+    assert bow == bag_of_words(data, 'count')
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_text_requires_string_data(texts, n_jobs):
+    data = '\n'.join(texts)
+    with pytest.raises(TypeError):
+        nlp.Text(io.StringIO(data))
+    with pytest.raises(TypeError):
+        NLPJob([data, io.StringIO(data)], n_jobs=n_jobs)
+    text = nlp.Text('speeches.txt', stems=iter_stems(io.StringIO(data)))
+    assert text.data == 'speeches.txt'
+    assert text.stems == stemize(data)
+
+
+def test_deputy_texts_deduplicates_and_caches_joins():
+    deputy = miner.DeputyTexts('Fulano')
+    deputy.add_discourses(['a', 'b', 'a'])
+    deputy.add_proposals(['x', 'x'])
+    assert list(deputy.discourses) == ['a', 'b']
+    assert deputy.discourse_text == 'a\n\nb'
+    assert deputy.proposal_text is deputy.proposal_text == 'x'
+    deputy.add_discourse('b')
+    assert deputy.discourse_text == 'a\n\nb'
+    deputy.add_discourse('c')
+    assert deputy.discourse_text == 'a\n\nb\n\nc'
+
+
+def test_similarity_index_matches_brute_force(texts, job):
+    index = SimilarityIndex(job)
+    matrix = job.matrix(dense=True)
+    queries = ['reforma da previdência', texts[1], 'nenhuma palavra comum']
+    results = index.query_many(queries, k=2)
+    for query, result in zip(queries, results):
+        assert result == index.query(query, k=2)
+        bow = bag_of_words(query, 'weighted', weights=job.weights())
+        vector = np.array([bow.get(stem, 0.0) for stem in job.words()])
+        norm = np.sqrt(sum(x * x for x in bow.values()))
+        cosines = matrix.dot(vector) / (np.linalg.norm(matrix, axis=1) * norm)
+        expected = [i for i in np.argsort(-cosines, kind='stable')
+                    if cosines[i] > 0][:2]
+        assert [i for (i, _) in result] == expected
+        assert np.allclose([c for (_, c) in result], cosines[expected])
+
+
+def test_sparse_std_matches_dense_std(job):
+    matrix = job.sparse_matrix()
+    std = nlp.sparse_std(matrix)
+    assert np.allclose(std, matrix.toarray().std(axis=0))
+
+
+def test_minibatch_kmeans_separates_clusters():
+    rng = np.random.RandomState(0)
+    data = np.zeros((200, 20))
+    data[:100, :10] = rng.poisson(3, (100, 10))
+    data[100:, 10:] = rng.poisson(3, (100, 10))
+    centroids, labels = nlp.minibatch_kmeans(
+        scipy.sparse.csr_matrix(data), 2, batch_size=32, seed=1)
+    assert centroids.shape == (2, 20)
+    assert len(set(labels[:100])) == len(set(labels[100:])) == 1
+    assert labels[0] != labels[-1]
+    assert np.allclose(centroids[labels[0], 10:], 0)
+
+    again = nlp.minibatch_kmeans(scipy.sparse.csr_matrix(data), 2,
+                                 batch_size=32, seed=1)
+    assert np.array_equal(again[0], centroids)
+
+
+def test_minibatch_kmeans_partial_fit_on_streamed_batches():
+    rng = np.random.RandomState(0)
+    data = np.zeros((200, 20))
+    data[:100, :10] = rng.poisson(3, (100, 10))
+    data[100:, 10:] = rng.poisson(3, (100, 10))
+    order = rng.permutation(200)
+
+    model = nlp.MiniBatchKMeans(2, seed=0)
+    for _ in range(3):
+        for start in range(0, 200, 25):
+            batch = data[order[start:start + 25]]
+            model.partial_fit(scipy.sparse.csr_matrix(batch))
+    labels = model.predict(scipy.sparse.csr_matrix(data))
+    assert len(set(labels[:100])) == len(set(labels[100:])) == 1
+    assert labels[0] != labels[-1]
+    assert model.counts.sum() == 600
+
+    with pytest.raises(ValueError):
+        nlp.MiniBatchKMeans(3).partial_fit(data[:2])
+
+
+def test_kmeans_minibatch_mode(job):
+    centroids, labels = nlp.kmeans(job, 2, batch_size=2, seed=0)
+    assert centroids.shape == (2, len(job.words()))
+    assert len(labels) == len(job)
+
+
+def test_silhouette_score_matches_pairwise_definition():
+    rng = np.random.RandomState(0)
+    data = rng.rand(30, 4)
+    labels = rng.randint(0, 3, 30)
+    dist = np.sqrt(((data[:, None] - data[None]) ** 2).sum(axis=2))
+    expected = []
+    for i in range(30):
+        same = (labels == labels[i]) & (np.arange(30) != i)
+        a = dist[i, same].mean()
+        b = min(dist[i, labels == c].mean() for c in set(labels)
+                if c != labels[i])
+        expected.append((b - a) / max(a, b))
+    score = nlp.silhouette_score(data, labels, block_size=7)
+    assert np.isclose(score, np.mean(expected))
+    sparse_score = nlp.silhouette_score(scipy.sparse.csr_matrix(data),
+                                        labels, block_size=7)
+    assert np.isclose(sparse_score, score)
+
+
+@pytest.mark.parametrize('batch_size', [None, 2])
+def test_kmeans_sweep_is_deterministic(texts, batch_size):
+    serial = nlp.kmeans_sweep(texts, [2, 3], n_init=3, n_jobs=1,
+                              batch_size=batch_size)
+    parallel = nlp.kmeans_sweep(texts, [2, 3], n_init=3, n_jobs=2,
+                                batch_size=batch_size)
+    assert sorted(serial) == sorted(parallel) == [2, 3]
+    for k, result in serial.items():
+        assert result.k == k
+        assert result.centroids.shape[0] == k
+        assert len(result.labels) == len(texts)
+        assert result.inertia == parallel[k].inertia
+        assert np.array_equal(result.labels, parallel[k].labels)
+        assert -1 <= result.silhouette <= 1
@@ -0,0 +1,42 @@
+from tenhodito_nlp import nlp, profiling, stemming
+from tenhodito_nlp.nlp import NLPJob
+
+
+def test_profile_records_nlp_stages(texts):
+    stemming.clear_stem_cache()
+    with profiling.profile() as report:
+        job = NLPJob(texts)
+        job.similarity_matrix()
+        job.sparse_matrix()
+        nlp.kmeans(job, 2, seed=0)
+    assert not profiling.is_enabled()
+
+    for name in ['stemming', 'bag_of_words', 'weights', 'matrix',
+                 'similarity', 'kmeans']:
+        assert report[name].calls > 0
+        assert report[name].time > 0
+    assert report['stemming'].calls == len(texts)
+    assert report['stemming'].misses > 0
+    assert report['stemming'].hits > 0
+    assert report['matrix'].calls == 1
+    assert report['matrix'].hit_rate == 0.5
+    assert report['matrix'].peak > 0
+    assert 'stemming' in report.format()
+    assert report.as_dict()['stages'][0]['name'] == 'stemming'
+
+
+def test_instrumentation_is_disabled_by_default(texts):
+    NLPJob(texts)
+    with profiling.stage('stemming'):
+        pass
+    profiling.count('matrix', hit=True)
+    assert profiling.disable() is None
+
+
+def test_nested_stages_are_measured_once():
+    with profiling.profile(trace_memory=False) as report:
+        with profiling.stage('outer'):
+            with profiling.stage('inner'), profiling.stage('outer'):
+                pass
+    assert report['outer'].calls == report['inner'].calls == 1
+    assert report['outer'].peak == 0
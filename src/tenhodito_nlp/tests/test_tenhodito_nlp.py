@@ -1,3 +1,8 @@
+import json
+import os
+import subprocess
+import sys
+
 import pytest
 import tenhodito_nlp
 
@@ -5,3 +10,71 @@ import tenhodito_nlp
 def test_project_defines_author_and_version():
     assert hasattr(tenhodito_nlp, '__author__')
     assert hasattr(tenhodito_nlp, '__version__')
+
+
+def test_import_has_no_side_effects(tmpdir):
+    code = ('import sys, json, tenhodito_nlp, tenhodito_nlp.fixtures\n'
+            'tenhodito_nlp.stemize("O deputado votou")\n'
+            'print(json.dumps(sorted(sys.modules)))')
+    # The package may not be installed, so it is imported from the checkout
+    path = os.path.dirname(os.path.dirname(tenhodito_nlp.__file__))
+    paths = [path] + os.environ.get('PYTHONPATH', '').split(os.pathsep)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, paths)))
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=str(tmpdir), env=env)
+    modules = json.loads(output.decode('utf-8'))
+    for name in ['numpy', 'faker', 'pygov_br', 'requests',
+                 'tenhodito_nlp.nlp', 'tenhodito_nlp.miner']:
+        assert name not in modules
+    assert tmpdir.listdir() == []
+
+
+def test_fixtures_module_reexports_split_modules():
+    from tenhodito_nlp import fakes, fixtures, miner, nlp, stemming
+
+    assert fixtures.stemize is stemming.stemize
+    assert fixtures.NLPJob is nlp.NLPJob
+    assert fixtures.DiscourseMiner is miner.DiscourseMiner
+    assert fixtures.fake_text is fakes.fake_text
+
+
+def test_cli_parses_subcommands():
+    from tenhodito_nlp.__main__ import get_parser
+
+    parser = get_parser()
+    args = parser.parse_args(['mine', '1/8/2016', '-j', '4', '--dedup'])
+    assert (args.start, args.end, args.jobs) == ('1/8/2016', None, 4)
+    assert args.dedup is True
+    args = parser.parse_args(['fetch', '1/8/2016', '31/8/2016', '-j', '2'])
+    assert args.workers == 2
+    args = parser.parse_args(['coherence', 'in.jsonl', '-'])
+    assert args.func.__name__ == 'process_command'
+
+
+def _cluster(tmpdir, *args):
+    from tenhodito_nlp.__main__ import main
+
+    texts = ['reforma da previdência social', 'previdência social e reforma',
+             'saúde e educação pública', 'educação e saúde pública']
+    infile, outfile = tmpdir.join('in.jsonl'), tmpdir.join('out.jsonl')
+    infile.write_text(''.join(
+        json.dumps({'deputy': str(i), 'discourses': [text]}) + '\n'
+        for (i, text) in enumerate(texts)), 'utf-8')
+    main(['cluster', str(infile), '-o', str(outfile), '--n-init', '3',
+          '-j', '1'] + list(args))
+    return [json.loads(line) for line in outfile.readlines()]
+
+
+def test_cli_cluster(tmpdir):
+    records = _cluster(tmpdir, '-k', '2', '3')
+    assert [r['deputy'] for r in records] == ['0', '1', '2', '3']
+    labels = [r['cluster'] for r in records]
+    assert labels[0] == labels[1] != labels[2] == labels[3]
+
+
+def test_cli_cluster_ignores_undefined_silhouette(tmpdir, capsys):
+    records = _cluster(tmpdir, '-k', '1', '2')
+    assert {r['k'] for r in records} == {2}
+    err = capsys.readouterr().err
+    assert 'silhouette=-\n' in err
+    assert 'silhouette=nan' not in err